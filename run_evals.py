@@ -1,15 +1,18 @@
 import os
-import glob
-import json
 import csv
+import io
+import hashlib
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
+import numpy as np
+import orjson
 from rich.console import Console
 
-from src.config import CONFIG
 from src.evals.information_evaluator import InformationRequestEvaluator
-from src.evals.lab_cost_evaluator import LabCostEvaluator
+from src.evals.lab_cost_evaluator import DEFAULT_CLFS, LabCostEvaluator
 from src.evals.treatment_evaluator import (
     AppendicitisEvaluator,
     CholecystitisEvaluator,
@@ -18,6 +21,7 @@ from src.evals.treatment_evaluator import (
 )
 from src.evals.treatment_utils import extract_treatment
 from src.evals.diagnosis    import (
+    PATHOLOGIES,
     match_pathology,
     parse_ranked_diagnoses,
     parse_diagnosis,
@@ -26,9 +30,199 @@ from src.evals.diagnosis    import (
 from src.evals.lab_interpretation_evaluator import LabInterpretationEvaluator
 
 from src.utils.logging import console
+from src.utils.paths import dataset_path_for, log_dir_name
 from src.evals.token_cost import compute_token_cost
 
 
+# rows are buffered in memory and handed to the CSV writer in batches
+CSV_FLUSH_EVERY = 256
+
+PATHOLOGY_ID = {p: i for i, p in enumerate(PATHOLOGIES)}
+
+# sources whose contents decide a patient's score; any edit to them (or to
+# the dataset and CLFS schedule, see scoring_fingerprint) invalidates the score cache
+SCORING_SOURCES = (
+    Path(__file__).resolve(),
+    *sorted((Path(__file__).resolve().parent / "src" / "evals").glob("*.py")),
+    Path(__file__).resolve().parent / "src" / "utils" / "nlp.py",
+)
+
+# threads overlapping lab-interp updates when LLM synonym matching is on
+INTERP_THREADS = 16
+
+def read_front(path: str, chunk_size: int = 8192) -> dict:
+    """
+    Parse only the JSON front-matter of a per-patient log, reading the file
+    in `chunk_size` blocks until the first blank line. The transcript body
+    is never decoded here.
+    """
+    buf = bytearray()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            buf += block
+            i = buf.find(b"\n\n")
+            if i != -1:
+                return orjson.loads(bytes(buf[:i]))
+    return orjson.loads(bytes(buf))
+
+
+def candidate_match(pathology: str, diagnosis: str, exact_only: bool = False) -> bool:
+    """
+    Literal equality fast path in front of `check_diagnosis_match`; with
+    `exact_only` the fuzzy/negation matcher is skipped entirely.
+    """
+    if diagnosis and diagnosis.strip().lower() == pathology:
+        return True
+    if exact_only:
+        return False
+    return check_diagnosis_match(pathology, diagnosis)
+
+
+# per-process evaluators used for the stateless part of scoring (see score_one)
+_SCORERS = None
+
+def scoring_evaluators() -> tuple[InformationRequestEvaluator, LabCostEvaluator]:
+    """
+    Process-local (info-request, lab-cost) evaluators, built on first use, so
+    each pool worker loads the guideline tables and CLFS schedule once.
+    """
+    global _SCORERS
+    if _SCORERS is None:
+        _SCORERS = (InformationRequestEvaluator(), LabCostEvaluator())
+    return _SCORERS
+
+
+def cache_key(raw: bytes, salt: str) -> str:
+    """Content hash of a log file plus the evaluation settings in `salt`."""
+    h = hashlib.blake2b(raw, digest_size=16)
+    h.update(salt.encode("utf-8"))
+    return h.hexdigest()
+
+
+def scoring_fingerprint(*data_files: str | os.PathLike) -> str:
+    """
+    Hash of the scoring sources plus the given data files, used to salt the
+    score cache instead of a hand-maintained version string.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for path in (*SCORING_SOURCES, *map(Path, data_files)):
+        h.update(str(path.name).encode("utf-8"))
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def score_one(
+    path: str,
+    exact_only: bool = False,
+    cache_dir: str | None = None,
+    cache_salt: str = ""
+) -> dict:
+    """
+    Parse the JSON front-matter of one per-patient log and score the
+    final diagnosis. Pure function of the file contents, so it can run in a
+    worker process; the stateful evaluators are updated by the caller.
+
+    With `cache_dir`, a previous result for identical file contents and
+    settings is returned from `<cache_dir>/<pid>.<hash>.json` instead; the
+    caller writes new entries once the lab-interpretation score is known.
+    """
+    pid = Path(path).stem
+    cache_path = None
+    if cache_dir:
+        key        = cache_key(Path(path).read_bytes(), cache_salt)
+        cache_path = os.path.join(cache_dir, f"{pid}.{key}.json")
+        if os.path.exists(cache_path):
+            cached = orjson.loads(Path(cache_path).read_bytes())
+            cached.update(path=path, cache_path=None)
+            return cached
+
+    meta = read_front(path)
+
+    final_txt  = meta["final"]
+    error_flag = meta["error"]
+    gold_diag  = meta["gold_diagnosis"].lower()
+
+    # ───── diagnosis scoring ────────────────────────────────────────────────
+    if error_flag:
+        top1 = top3 = top5 = False
+        correct = False
+        pathology = None
+    else:
+        pathology = match_pathology(gold_diag)
+
+        if pathology is None:
+            top1 = top3 = top5 = False
+
+        else:
+            # Extract up to 5 *ranked* diagnoses from the final transcript
+            ranked_diags = parse_ranked_diagnoses(final_txt)
+            # If none found, fall back to parsing a single final diagnosis
+            if not ranked_diags:
+                ranked_diags = [parse_diagnosis(final_txt)]
+
+            console.log(f"{pid}  ranked_diags = {ranked_diags}")
+
+            # top-k flags only depend on the rank of the first match, so stop
+            # scoring candidates as soon as one matches
+            first = next(
+                (i for i, d in enumerate(ranked_diags[:5])
+                 if candidate_match(pathology, d, exact_only)),
+                None
+            )
+            top1 = first == 0
+            top3 = first is not None and first < 3
+            top5 = first is not None
+
+        correct = top1   # “micro accuracy”
+
+    treat_txt = (extract_treatment(final_txt) or "") if pathology else ""
+
+    # ───── info-request coverage & lab cost (scores only; caller folds) ────
+    info_eval, lab_cost_eval = scoring_evaluators()
+    m = meta["metrics"]
+    info_scores = info_eval.score(
+        pathology,
+        m.get("lab_tests_requested",[]),
+        m.get("requested_imaging",[]),
+        m.get("physical_exam_maneuvers_requested",[]),
+    ) if pathology else None
+    lab_cost = lab_cost_eval.cost_of(m.get("lab_tests_requested",()))
+
+    return {
+        "pid":          pid,
+        "path":         path,
+        "metrics":      meta["metrics"],
+        "duration_sec": meta["duration_sec"],
+        "error":        error_flag,
+        "pathology":    pathology,
+        "top1":         top1,
+        "top3":         top3,
+        "top5":         top5,
+        "correct":      correct,
+        "treat_txt":    treat_txt,
+        "info_scores":  info_scores,
+        "lab_cost":     lab_cost,
+        "interp":       None,   # (correct, total), filled in by the caller
+        "cache_path":   cache_path,
+    }
+
+
+def store_cached(r: dict, interp_eval: LabInterpretationEvaluator) -> None:
+    """
+    Attach the lab-interp score to a fresh `score_one` result and, if it has
+    a cache slot, persist it (write-then-rename, so entries are never torn).
+    """
+    p_interp    = interp_eval.per_patient[r["pid"]]
+    r["interp"] = (p_interp["correct"], p_interp["total"])
+    if not r["cache_path"]:
+        return
+    entry = {k: v for k, v in r.items() if k not in ("path", "cache_path")}
+    tmp   = r["cache_path"] + ".tmp"
+    Path(tmp).write_bytes(orjson.dumps(entry))
+    os.replace(tmp, r["cache_path"])
 
 
 def test_logs(
@@ -36,47 +230,65 @@ def test_logs(
     *,
     csv_out: str | None = None,
     skip_fuzzy: bool = False,
-    no_llm_match: bool = False
+    no_llm_match: bool = False,
+    workers: int = 1,
+    exact_only: bool = False,
+    use_cache: bool = True
 ) -> None:
     """
     Read per-patient .txt logs from `log_dir/*.txt`, extract the JSON
     front-matter and metrics, update all evaluators, write a CSV of
     patient-level results, and produce a summary TXT.
+
+    `workers > 1` scores logs in a process pool of that size; `exact_only`
+    counts a ranked diagnosis as correct only on literal equality.
+    Per-patient scores are cached under `results/.cache/` keyed on the log
+    contents and these settings unless `use_cache` is False.
     """
-    pattern   = os.path.join(log_dir, "*.txt")
-    log_files = sorted(glob.glob(pattern))
+    with os.scandir(log_dir) as it:
+        log_files = sorted(e.path for e in it if e.name.endswith(".txt") and e.is_file())
     total     = len(log_files)
     console.log(f"[green]▶ Evaluating {total} patients from {log_dir}")
 
     # CSV setup (default into results/<logname>.csv)
     results_dir = "results"
     os.makedirs(results_dir, exist_ok=True)
-    csv_out = csv_out or os.path.join(results_dir, f"{os.path.basename(log_dir)}.csv")
-    summary_file = os.path.join(results_dir, f"summary_{os.path.basename(log_dir)}.txt")
+    log_name = log_dir_name(log_dir)
+    csv_out = csv_out or os.path.join(results_dir, f"{log_name}.csv")
+    summary_file = os.path.join(results_dir, f"summary_{log_name}.txt")
     
     fieldnames = [
         "patient_id","correct","top1","top3","top5","processing_sec",
         "tool_calls","lab_req","img_req","exam_req",
         "estimated_lab_cost", "status"
     ]
-    csv_f      = open(csv_out, "w", newline="")
-    writer     = csv.DictWriter(csv_f, fieldnames=fieldnames)
-    writer.writeheader()
+    csv_f      = open(csv_out, "w", newline="", buffering=1 << 20)
+    writer     = csv.writer(csv_f)
+    writer.writerow(fieldnames)
+    pending_rows = []
 
     # ------------- light‑weight global counters ------------------------------
     totals             = defaultdict(float)   # numeric
-    totals["lab_cost"] = 0
-    totals["top1"]     = totals["top3"] = totals["top5"] = 0
     totals["failed"]   = 0
-    pathology_total    = defaultdict(int)   # per‑pathology denominators
-    pathology_correct  = defaultdict(int)
+
+    # per-patient columns, reduced with NumPy once the loop is done
+    top1_arr     = np.zeros(total, dtype=bool)
+    top3_arr     = np.zeros(total, dtype=bool)
+    top5_arr     = np.zeros(total, dtype=bool)
+    correct_arr  = np.zeros(total, dtype=bool)
+    dur_arr      = np.zeros(total)
+    lab_cost_arr = np.zeros(total)
+
+    # running per-pathology accumulators, indexed like PATHOLOGIES
+    p_total   = np.zeros(len(PATHOLOGIES), dtype=np.int32)
+    p_correct = np.zeros_like(p_total)
+    p_order   = []   # pathology indices in order of first appearance
     
     # Patient Dataset
-    split = Path(log_dir).name.split("_")[-1]
+    split = log_name.split("_")[-1]
     if split not in {"train","val","test"}:
         raise ValueError(f"dataset_type must be train|val|test, got {split}")
-    dataset_path = os.path.join(CONFIG.paths.dataset_base_path,
-                                f"master_patient_data_{split}.json")
+    dataset_path = dataset_path_for(split)
     if not os.path.exists(dataset_path):
         raise FileNotFoundError(f"✘ dataset not found: {dataset_path}")
 
@@ -86,122 +298,154 @@ def test_logs(
     skip_fuzzy=skip_fuzzy,
     no_llm_match=no_llm_match
     )
+    # scoring itself runs in score_one; these only accumulate the totals
     info_eval     = InformationRequestEvaluator()
     lab_cost_eval = LabCostEvaluator()
     app_eval      = AppendicitisEvaluator()
     cho_eval      = CholecystitisEvaluator()
     pan_eval      = PancreatitisEvaluator()
     div_eval      = DiverticulitisEvaluator()
+    treatment_evals = {
+        "appendicitis": app_eval, "cholecystitis": cho_eval,
+        "pancreatitis": pan_eval, "diverticulitis": div_eval,
+    }
+    treatments = {pathology: [] for pathology in treatment_evals}
+
+
+    # Per‐patient loop: parsing and diagnosis scoring run in worker
+    # processes, evaluator updates stay on the main process (they are stateful)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    cache_dir, cache_salt = None, ""
+    if use_cache:
+        cache_dir = os.path.join(results_dir, ".cache")
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_salt = (
+            f"{scoring_fingerprint(dataset_path, DEFAULT_CLFS)}"
+            f"|{exact_only}|{skip_fuzzy}|{no_llm_match}"
+        )
+    scorer   = partial(
+        score_one,
+        exact_only=exact_only,
+        cache_dir=cache_dir,
+        cache_salt=cache_salt
+    )
+    results  = (
+        executor.map(scorer, log_files, chunksize=16)
+        if executor
+        else map(scorer, log_files)
+    )
 
+    # LLM synonym matching in the lab-interp evaluator is network-bound, so
+    # overlap those updates in a thread pool when it is enabled
+    interp_pool = ThreadPoolExecutor(max_workers=INTERP_THREADS) if not no_llm_match else None
+    interp_jobs = []   # (result, future) pairs awaiting their lab-interp score
 
-    # Per‐patient loop
-    for idx, path in enumerate(log_files, start=1):
-        pid = Path(path).stem
-        text = open(path, "r", encoding="utf-8").read()
-        front, _, _ = text.partition("\n\n")
-        meta = json.loads(front)
-
-        m           = meta["metrics"]
-        dur         = meta["duration_sec"]
-        final_txt   = meta["final"]
-        error_flag  = meta["error"]
-        gold_diag   = meta["gold_diagnosis"].lower()
+    for i, r in enumerate(results):
+        pid        = r["pid"]
+        m          = r["metrics"]
+        dur        = r["duration_sec"]
+        error_flag = r["error"]
+        pathology  = r["pathology"]
+        top1, top3, top5 = r["top1"], r["top3"], r["top5"]
+        correct    = r["correct"]
 
-        # ───── diagnosis scoring ────────────────────────────────────────────
         if error_flag:
-            top1 = top3 = top5 = False
-            correct = False
-            pathology = None
             totals["failed"] += 1
-        else:
-            pathology = match_pathology(gold_diag)
 
-            if pathology is None:
-                top1 = top3 = top5 = False
+        # bookkeeping
+        top1_arr[i]    = top1
+        top3_arr[i]    = top3
+        top5_arr[i]    = top5
+        correct_arr[i] = correct
+        dur_arr[i]     = dur
 
+        # ───── global counters (single increment) ───────────────────────────
+        # lab interp (the only consumer of the full transcript body)
+        if r["interp"] is not None:
+            interp_eval.record(pid, *r["interp"])
+        else:
+            text = Path(r["path"]).read_bytes().decode("utf-8")
+            if interp_pool:
+                interp_jobs.append((r, interp_pool.submit(interp_eval.update, pid, text)))
             else:
-                # Extract up to 5 *ranked* diagnoses from the final transcript
-                ranked_diags = parse_ranked_diagnoses(final_txt)
-                # If none found, fall back to parsing a single final diagnosis
-                if not ranked_diags:
-                    ranked_diags = [parse_diagnosis(final_txt)]
-
-                console.log(f"{pid}  ranked_diags = {ranked_diags}")
+                interp_eval.update(pid, text)
+                store_cached(r, interp_eval)
 
-                top1 = check_diagnosis_match(pathology, ranked_diags[0])
-                top3 = any(check_diagnosis_match(pathology, d) for d in ranked_diags[:3])
-                top5 = any(check_diagnosis_match(pathology, d) for d in ranked_diags[:5])
-
-            # bookkeeping
-            totals["top1"] += int(top1)
-            totals["top3"] += int(top3)
-            totals["top5"] += int(top5)
-            correct = top1   # “micro accuracy”
-
-        # ───── global counters (single increment) ───────────────────────────
-        # lab interp
-        interp_eval.update(pid, text)
-        
         # lab cost
-        lab_cost = lab_cost_eval.update(m.get("lab_tests_requested",[]))
-        totals["lab_cost"] += lab_cost
+        lab_cost = r["lab_cost"]
+        lab_cost_eval.record(lab_cost)
+        lab_cost_arr[i] = lab_cost
 
         # other counters
-        totals["patients"]      += 1
-        totals["correct_cases"] += int(correct)
-        totals["time"]          += dur
         totals["physical_exam_first"]     += int(m.get("physical_exam_first",False))
         totals["physical_exam_requested"] += int(m.get("physical_exam_requested",False))
 
         if pathology:
-            pathology_total[pathology]   += 1
-            pathology_correct[pathology] += int(correct)
+            j = PATHOLOGY_ID[pathology]
+            if not p_total[j]:
+                p_order.append(j)
+            p_total[j]   += 1
+            p_correct[j] += correct
 
             # Info‐request
-            info_eval.update(
-                pathology,
+            info_eval.record(
                 m.get("lab_tests_requested",[]),
                 m.get("requested_imaging",[]),
                 m.get("physical_exam_maneuvers_requested",[]),
-                m.get("physical_exam_count",0)
+                m.get("physical_exam_count",0),
+                r["info_scores"]
             )
 
-            # Treatment
-            treat_txt = extract_treatment(final_txt) or ""
-            if pathology=="appendicitis":   app_eval.score_treatment(treat_txt)
-            elif pathology=="cholecystitis": cho_eval.score_treatment(treat_txt)
-            elif pathology=="pancreatitis":  pan_eval.score_treatment(treat_txt)
-            elif pathology=="diverticulitis":div_eval.score_treatment(treat_txt)
-
-        # ───── CSV row ──────────────────────────────────────────────────────
-        writer.writerow({
-            "patient_id"         : pid,
-            "correct"            : "yes" if correct else "no",
-            "top1"               : int(top1),
-            "top3"               : int(top3),
-            "top5"               : int(top5),
-            "processing_sec"     : round(dur,2),
-            "tool_calls"         : m.get("tool_call_count",0),
-            "lab_req"            : m.get("lab_count",0),
-            "img_req"            : m.get("imaging_count",0),
-            "exam_req"           : m.get("physical_exam_count",0),
-            "estimated_lab_cost": round(lab_cost,2),
-            "status"             : "failed" if error_flag else "ok",
-        })
-
+            # Treatment (scored per pathology in one batch after the loop)
+            if pathology in treatments:
+                treatments[pathology].append(r["treat_txt"])
+
+        # ───── CSV row (same order as `fieldnames`) ─────────────────────────
+        pending_rows.append((
+            pid,
+            "yes" if correct else "no",
+            int(top1),
+            int(top3),
+            int(top5),
+            round(dur,2),
+            m.get("tool_call_count",0),
+            m.get("lab_count",0),
+            m.get("imaging_count",0),
+            m.get("physical_exam_count",0),
+            round(lab_cost,2),
+            "failed" if error_flag else "ok",
+        ))
+        if len(pending_rows) >= CSV_FLUSH_EVERY:
+            writer.writerows(pending_rows)
+            pending_rows.clear()
+
+    writer.writerows(pending_rows)
     csv_f.close()
+    if executor:
+        executor.shutdown(wait=True)
+
+    for r, fut in interp_jobs:
+        fut.result()
+        store_cached(r, interp_eval)
+    if interp_pool:
+        interp_pool.shutdown(wait=True)
+
+    for pathology, texts in treatments.items():
+        treatment_evals[pathology].score_treatment_many(texts)
     
 
     # ------------- derive metrics --------------------------------------------
-    micro_acc = 100 * totals["correct_cases"] / totals["patients"]
-    if pathology_total:
-        macro_acc = (
-            sum(100*pathology_correct[p]/pathology_total[p]
-                for p in pathology_total if pathology_total[p])
-            / len(pathology_total)
-        )
-    else:
-        macro_acc = 0.0
+    totals["patients"] = total
+    totals["time"]     = float(dur_arr.sum())
+    totals["lab_cost"] = float(lab_cost_arr.sum())
+
+    micro_acc = 100 * correct_arr.mean()
+
+    seen      = p_total > 0
+    macro_acc = float(100 * (p_correct[seen] / p_total[seen]).mean()) if seen.any() else 0.0
+
+    pathology_total   = {PATHOLOGIES[j]: int(p_total[j])   for j in p_order}
+    pathology_correct = {PATHOLOGIES[j]: int(p_correct[j]) for j in p_order}
 
     phys_first = 100 * totals["physical_exam_first"]     / totals["patients"]
     phys_any   = 100 * totals["physical_exam_requested"] / totals["patients"]
@@ -216,9 +460,9 @@ def test_logs(
     totals["token_cost"] = compute_token_cost(log_dir)
 
     elapsed_time = totals["time"]
-    top1_acc = 100 * totals["top1"] / totals["patients"]
-    top3_acc = 100 * totals["top3"] / totals["patients"]
-    top5_acc = 100 * totals["top5"] / totals["patients"]
+    top1_acc = 100 * top1_arr.mean()
+    top3_acc = 100 * top3_arr.mean()
+    top5_acc = 100 * top5_arr.mean()
 
     # Treatment summaries
     app_stats = app_eval.calculate_treatment_percentages()
@@ -226,8 +470,8 @@ def test_logs(
     pan_stats = pan_eval.calculate_treatment_percentages()
     div_stats = div_eval.calculate_treatment_percentages()
 
-    # Write summary TXT
-    with open(summary_file,"w") as f:
+    # Build the summary TXT in memory, then write it with a single call
+    with io.StringIO() as f:
         f.write("==== Summary Statistics ====\n")
         # TODO: Change this to token cost
         f.write("Cost Metrics:\n")
@@ -274,6 +518,11 @@ def test_logs(
         for k, v in interp_metrics.items():
             f.write(f"{k}: {v}\n")
 
+        summary_text = f.getvalue()
+
+    with open(summary_file, "w") as fh:
+        fh.write(summary_text)
+
     console.rule("[bold green]Evaluation complete")
     console.print(f"Micro accuracy : {micro_acc:.2f}%")
     console.print(f"Total token cost     : ${totals['token_cost']:.2f}")
@@ -295,11 +544,17 @@ if __name__ == "__main__":
     parser.add_argument("--csv_out", default=None, help="Path to write the per-patient CSV (defaults to results_<log_dir>.csv)")
     parser.add_argument("--skip_fuzzy", action="store_true", help="turn off fuzzy matching in lab interp evaluator")
     parser.add_argument("--no_llm_match", action="store_true", help="turn off GPT-synonym matching in lab interp evaluator")
+    parser.add_argument("--exact_only", action="store_true", help="only count literal matches of the gold pathology (skip fuzzy diagnosis matching)")
+    parser.add_argument("--no_cache", action="store_true", help="ignore and do not write the per-patient score cache in results/.cache")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="#processes for log parsing/diagnosis scoring (1 = serial)")
 
     args = parser.parse_args()
     test_logs(
         log_dir=args.log_dir,
         csv_out=args.csv_out,
         skip_fuzzy=args.skip_fuzzy,
-        no_llm_match=args.no_llm_match
+        no_llm_match=args.no_llm_match,
+        workers=args.workers,
+        exact_only=args.exact_only,
+        use_cache=not args.no_cache
     )
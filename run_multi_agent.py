@@ -1,16 +1,17 @@
 #!/usr/bin/env python3
 import os
-import json
+import orjson
 import gc
 import torch
 import argparse
+from pathlib import Path
 from typing import Any, Dict
 
-from src.config import CONFIG
-from src.models import load_model
+from src.models import approx_token_counts, load_model
 from src.agents.multi_agent import build_graph
 from src.utils.pipeline_runner import process_all_patients
 from src.utils.logging import console, initialize_file_logging
+from src.utils.paths import dataset_path_for
 
 def main(args: Dict[str, Any]) -> None:
     """
@@ -23,12 +24,11 @@ def main(args: Dict[str, Any]) -> None:
     7) Clean up
     """
     # ---------- resolve dataset path ----------------------------------------
-    base_path = CONFIG.paths.dataset_base_path
     split     = args["dataset_type"]
     if split not in {"train", "val", "test"}:
         raise ValueError(f"dataset_type must be train | val | test, got {split}")
 
-    dataset_path = os.path.join(base_path, f"master_patient_data_{split}.json")
+    dataset_path = dataset_path_for(split)
     if not os.path.exists(dataset_path):
         raise FileNotFoundError(f"✘ dataset not found: {dataset_path}")
 
@@ -54,8 +54,8 @@ def main(args: Dict[str, Any]) -> None:
     diagnosis_llm      = load_model(model_id=args["model_id_diagnosis"], matcher=False)
 
     # ---------- build & run --------------------------------------------------
-    with open(dataset_path) as f:
-        patient_data = json.load(f)
+    with open(dataset_path, "rb", buffering=1 << 22) as f:
+        patient_data = orjson.loads(f.read())
 
     graph = build_graph(
         info_llm=info_llm,
@@ -73,6 +73,7 @@ def main(args: Dict[str, Any]) -> None:
         graph,
         dataset_path=dataset_path,
         log_dir=log_dir,
+        patient_data=patient_data,   # already parsed for the graph; skip a second load
         max_workers=args.get("concurrency", 1)
     )
 
@@ -91,9 +92,9 @@ def main(args: Dict[str, Any]) -> None:
         "matcher_output_tokens":  matcher_llm.total_output_tokens,
         "diagnosis_input_tokens": diagnosis_llm.total_input_tokens,
         "diagnosis_output_tokens":diagnosis_llm.total_output_tokens,
+        "token_count_mode":       "approx" if approx_token_counts() else "exact",
     }
-    with open(token_stats_path, "w", encoding="utf-8") as tf:
-        json.dump(token_stats, tf, indent=2)
+    Path(token_stats_path).write_bytes(orjson.dumps(token_stats, option=orjson.OPT_INDENT_2))
     console.log(f"✅ Token stats saved to {token_stats_path}")
 
     # ---------- final cleanup ------------------------------------------------
@@ -116,6 +117,10 @@ if __name__ == "__main__":
     p.add_argument("--log_to_file", action="store_true")
     p.add_argument("--log_filename")
     p.add_argument("--concurrency", type=int, default=1, help="#threads for network-bound inference (1 = serial)")
+    p.add_argument("--approx_token_counts", action="store_true",
+                   help="estimate texts under 64 chars as len // 4 instead of encoding them")
 
     args_ns = p.parse_args()
+    if args_ns.approx_token_counts:
+        os.environ["TOKEN_COUNT_APPROX"] = "1"
     main(vars(args_ns))
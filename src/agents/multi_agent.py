@@ -34,18 +34,26 @@ from langgraph.graph import (
     StateGraph, 
     END
 )
-from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
+from langchain_core.messages import AIMessage, SystemMessage
 
 from ..prompts   import (
     INFO_GATHERING_PROMPT,
     INTERPRETATION_PROMPT,
-    DIAGNOSIS_PROMPT
+    DIAGNOSIS_PROMPT,
+    HISTORY_SUMMARY_PROMPT
 )
 from ..config import CONFIG
 
 from .retrieve_results  import RetrieveResults, make_retrieve_node
 
 
+# System prompts are immutable, so build each SystemMessage once and share it
+_INFO_SYS    = SystemMessage(content=INFO_GATHERING_PROMPT)
+_INTERP_SYS  = SystemMessage(content=INTERPRETATION_PROMPT)
+_DIAG_SYS    = SystemMessage(content=DIAGNOSIS_PROMPT)
+_SUMMARY_SYS = SystemMessage(content=HISTORY_SUMMARY_PROMPT)
+
+
 # -----------------------------------------------------------------------------
 #  Custom Message Types
 # -----------------------------------------------------------------------------
@@ -60,21 +68,101 @@ class DiagnosisMessage(AIMessage):
 
 
 class AgentState(MessagesState):
-    """Holds the conversation messages, plus patient_id & iteration count."""
+    """
+    Holds the conversation messages, plus patient_id & iteration count.
+    `summary` condenses messages[1:summary_upto] once the history outgrows
+    the configured window (see `windowed_history`).
+    """
     summary: str
+    summary_upto: int = 1
     patient_id: str
     iteration: int = 0
 
 
+# -----------------------------------------------------------------------------
+#  History window
+# -----------------------------------------------------------------------------
+def _history_window() -> int:
+    """Number of recent InfoGathering cycles sent verbatim; 0 = all."""
+    return getattr(CONFIG.runtime, "history_window", 0)
+
+
+def _window_start(messages: List[Any], cycles: int, floor: int) -> int:
+    """
+    Index of the InfoGatheringMessage opening the `cycles`-th most recent
+    cycle (gather → tool result → optional interpretation), or `floor` if
+    there are fewer. Cutting only there keeps every ToolMessage next to the
+    AIMessage whose tool_calls it answers.
+    """
+    seen = 0
+    for i in range(len(messages) - 1, floor, -1):
+        if isinstance(messages[i], InfoGatheringMessage):
+            seen += 1
+            if seen == cycles:
+                return i
+    return floor
+
+
+def windowed_history(sys_msg: SystemMessage, state: Dict[str, Any], messages: List[Any]) -> List[Any]:
+    """
+    Return the prompt for an agent as one freshly built list: its system
+    message, the initial case presentation, the rolling summary (if any),
+    and every message not yet summarised.
+    """
+    upto = state.get("summary_upto", 1)
+    if upto <= 1 or not state.get("summary"):
+        return [sys_msg, *messages]
+    summary_msg = SystemMessage(content=f"Summary of earlier findings:\n{state['summary']}")
+    return [sys_msg, messages[0], summary_msg, *messages[upto:]]
+
+
+def summarize_history(state: Dict[str, Any], llm: Any) -> Dict[str, Any]:
+    """
+    Fold cycles that fell out of the history window into `state["summary"]`.
+    Returns the state update (empty if the window is disabled or not full).
+
+    The summary is generated by `llm` (the interpretation model, see
+    `interpret_results`), so its tokens are billed to that model's counters.
+    """
+    window   = _history_window()
+    messages = state["messages"]
+    upto     = state.get("summary_upto", 1)
+    if not window:
+        return {}
+    new_upto = _window_start(messages, window, upto)
+    if new_upto <= upto:
+        return {}
+
+    excerpt = [*messages[upto:new_upto]]
+    if state.get("summary"):
+        excerpt.insert(0, SystemMessage(content=f"Previous summary:\n{state['summary']}"))
+    summary = llm.invoke([_SUMMARY_SYS, *excerpt])
+    return {"summary": summary, "summary_upto": new_upto}
+
+
 # -----------------------------------------------------------------------------
 #  Agent Callables
 # -----------------------------------------------------------------------------
+_THOUGHT_RE = re.compile(r"^Thought:", re.MULTILINE | re.IGNORECASE)
+_ACTION_RE  = re.compile(r"Action:", re.MULTILINE | re.IGNORECASE)
+_THINK_RE   = re.compile(r"</?think>", re.I)
+_FORMAT_RE  = re.compile(
+    r"(?:^|\s*)Thought:\s*(?P<thought>.*?)\s*\n"
+    r"Action:\s*(?P<action>[^\n]*\S[^\n]*)\s*\n"
+    r"Action Input:\s*(?P<action_input>.*?)(?=\s*$|\s*\n\s*\n)",
+    re.DOTALL | re.MULTILINE
+)
+
+
 def parse_info_gathering_response(response: str) -> Dict[str, Any]:
     """
     Parses the Info Gathering LLM output into thought/action/action_input.
     """
-    if not re.search(r"^Thought:", response, re.MULTILINE | re.IGNORECASE):
-        if re.search(r"Action:", response, re.MULTILINE | re.IGNORECASE):
+    if not isinstance(response, str):
+        response = str(response)
+
+    if not _THOUGHT_RE.search(response):
+        if _ACTION_RE.search(response):
             response = "Thought: Analyzing the case.\n" + response
         else:
             response = (
@@ -83,15 +171,9 @@ def parse_info_gathering_response(response: str) -> Dict[str, Any]:
                 "Action Input: Full physical exam"
             )
 
-    response = re.sub(r"</?think>", "", str(response), flags=re.I).strip()
+    response = _THINK_RE.sub("", response).strip()
 
-    pattern = re.compile(
-        r"(?:^|\s*)Thought:\s*(?P<thought>.*?)\s*\n"
-        r"Action:\s*(?P<action>[^\n]*\S[^\n]*)\s*\n"
-        r"Action Input:\s*(?P<action_input>.*?)(?=\s*$|\s*\n\s*\n)",
-        re.DOTALL | re.MULTILINE
-    )
-    m = pattern.search(response)
+    m = _FORMAT_RE.search(response)
     if m:
         return {
             "thought":      m.group("thought").strip(),
@@ -109,12 +191,15 @@ def parse_info_gathering_response(response: str) -> Dict[str, Any]:
     }
 
 
+# constant part of every Retrieve Results tool call
+_TOOL_CALL_TEMPLATE = {"name": "Retrieve Results", "id": "0"}
+
+
 def extract_tool_calls(response_dict: Dict[str, Any], patient_id: str) -> List[Dict[str, Any]]:
     if response_dict.get("tool_call") and response_dict.get("action"):
         return [{
-            "name": "Retrieve Results",
+            **_TOOL_CALL_TEMPLATE,
             "args": {"patient_id": patient_id, "response_dict": response_dict},
-            "id":   "0",
         }]
     return []
 
@@ -126,8 +211,8 @@ def gather_info(state: Dict[str, Any], llm: Any) -> Dict[str, Any]:
     messages   = state["messages"]
     patient_id = state["patient_id"]
 
-    sys_msg         = SystemMessage(content=INFO_GATHERING_PROMPT)
-    raw_response    = llm.invoke([sys_msg] + messages)
+    sys_msg         = _INFO_SYS
+    raw_response    = llm.invoke(windowed_history(sys_msg, state, messages))
     pr              = parse_info_gathering_response(raw_response)
     formatted       = (
         f"Thought: {pr['thought']}\n"
@@ -135,13 +220,18 @@ def gather_info(state: Dict[str, Any], llm: Any) -> Dict[str, Any]:
         f"Action Input: {pr['action_input']}"
     )
     tool_calls      = extract_tool_calls(pr, patient_id)
-    agent_response  = InfoGatheringMessage(content=formatted)
+    iteration       = state["iteration"] + 1
+
+    # decide the outgoing edge now, so `sufficient_info` is a plain lookup
+    done  = iteration >= CONFIG.runtime.max_iterations or not tool_calls or pr["action"] == "done"
+    route = "diagnosis" if done else "continue"
+    agent_response  = InfoGatheringMessage(content=formatted, additional_kwargs={"route": route})
     agent_response.tool_calls = tool_calls
 
 
     return {
         "messages":            [agent_response],
-        "iteration":           state["iteration"] + 1,
+        "iteration":           iteration,
     }
 
 
@@ -150,12 +240,16 @@ def interpret_results(state: Dict[str, Any], llm: Any) -> Dict[str, Any]:
     Interpretation Agent node: takes tool output messages and interprets them.
     """
     messages = state["messages"]
-    sys_msg  = SystemMessage(content=INTERPRETATION_PROMPT)
+    sys_msg  = _INTERP_SYS
 
-    raw_response   = llm.invoke([sys_msg] + messages)
+    raw_response   = llm.invoke(windowed_history(sys_msg, state, messages))
     agent_response = InterpretationMessage(content=raw_response)
 
-    return {"messages": [agent_response]}
+    # compact the history *after* answering, so the next agent sees the summary
+    update = summarize_history(
+        {**state, "messages": [*messages, agent_response]}, llm
+    )
+    return {"messages": [agent_response], **update}
 
 
 def give_diagnosis(state: Dict[str, Any], llm: Any) -> Dict[str, Any]:
@@ -165,9 +259,9 @@ def give_diagnosis(state: Dict[str, Any], llm: Any) -> Dict[str, Any]:
     # Don't include the last message from InfoGatheringAgent 
     # To try and reduce bias from Info gathering Agent
     messages = state["messages"][:-1]
-    sys_msg  = SystemMessage(content=DIAGNOSIS_PROMPT)
+    sys_msg  = _DIAG_SYS
 
-    raw_response   = llm.invoke([sys_msg] + messages)
+    raw_response   = llm.invoke(windowed_history(sys_msg, state, messages))
     agent_response = DiagnosisMessage(content=raw_response)
 
 
@@ -182,6 +276,9 @@ def sufficient_info(state: AgentState) -> str:
     After InfoGathering, decide whether to go to Tools or straight to Diagnosis.
     """
     last = state["messages"][-1]
+    route = last.additional_kwargs.get("route")
+    if route:
+        return route
     if state["iteration"] >= CONFIG.runtime.max_iterations  or not getattr(last, "tool_calls", []):
         return "diagnosis"
     args = last.tool_calls[0]["args"]["response_dict"]
@@ -194,13 +291,10 @@ def should_interpret(state: AgentState) -> str:
     """
     After Tools, decide whether to go to Interpretation or back to InfoGathering.
     """
-    last = state["messages"][-1]
-    if isinstance(last, ToolMessage):
-        # RetrieveResults tool encodes action in the result dict
-        action = last.additional_kwargs.get("action")
-        if action == "laboratory tests":
-            return "interpret"
-    return "continue"
+    # make_retrieve_node stamps the route on each ToolMessage it emits;
+    # every other message type continues
+    route = state["messages"][-1].additional_kwargs.get("route")
+    return "interpret" if route == "interpret" else "continue"
 
 
 # -----------------------------------------------------------------------------
@@ -15,7 +15,8 @@ result they’re looking at.
 * **make_retrieve_node(tools)** – small factory that wraps one (or more)
   tool instances into a LangGraph node.  
   It scans the last AIMessage for `tool_calls`, invokes the corresponding
-  tool(s), and emits a list of `ToolMessage`s ready to be appended to the
+  tool(s) concurrently (bounded by `runtime.tool_concurrency`, or as one
+  matcher batch when `runtime.use_batch_matcher` is set), and emits a list of `ToolMessage`s ready to be appended to the
   conversation state.
 
 If you introduce extra tools, create a new node factory or extend this one;
@@ -23,13 +24,18 @@ its JSON schema is tightly coupled to the output of `RetrieveResults`.
 """
 
 
-import json
-from typing import Any, Dict, List
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
 
 from langchain_core.messages import HumanMessage, ToolMessage
 from langchain.tools import BaseTool
 
-from ..prompts import LABS_MATCHER_PROMPT, IMAGING_MATCHER_PROMPT
+from ..config import CONFIG
+from ..prompts import LABS_MATCHER_FMT, IMAGING_MATCHER_FMT
+
+
+_NL_TRANS = str.maketrans({"\n": " "})
 
 
 class RetrieveResults(BaseTool):
@@ -43,8 +49,65 @@ class RetrieveResults(BaseTool):
     description = "Retrieves physical exam, lab, or imaging results."
     patient_data: Dict[str, Any]
     matcher_llm: Any
+    # (pid, action, normalised request, available-results hash) -> matcher reply
+    match_cache: Dict[Tuple[str, str, str, int], str] = {}
+    # per-patient "available results" strings, built once from patient_data
+    labs_str: Dict[str, str] = {}
+    imaging_str: Dict[str, str] = {}
+
+    def __init__(self, **data: Any) -> None:
+        super().__init__(**data)
+        self._index_patients()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "patient_data":
+            self._index_patients()
+
+    def _index_patients(self) -> None:
+        labs_str: Dict[str, str] = {}
+        imaging_str: Dict[str, str] = {}
+        for pid, record in self.patient_data.items():
+            labs = record.get("Laboratory Tests", {})
+            labs_str[pid] = ", ".join(f"{k}: {v}" for k, v in labs.items())
+            studies = record.get("Radiology", [])
+            if studies:
+                imaging_str[pid] = ", ".join([
+                    f"{s.get('Exam Name','?')} ({s.get('Modality','?')}): "
+                    f"{s.get('Report','').translate(_NL_TRANS)}"
+                    for s in studies
+                ])
+        # bypass __setattr__ so re-indexing doesn't recurse
+        object.__setattr__(self, "labs_str", labs_str)
+        object.__setattr__(self, "imaging_str", imaging_str)
 
     def _run(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        plan = self._plan(inputs)
+        if "result" in plan:
+            return plan
+        text = self.matcher_llm.invoke([HumanMessage(content=plan["prompt"])])
+        return self._finish(plan, text)
+
+    def run_batch(self, inputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Resolve several calls at once, sending every uncached matcher prompt in
+        a single `matcher_llm.batch(...)` dispatch.
+        """
+        plans   = [self._plan(i) for i in inputs]
+        pending = [p for p in plans if "result" not in p]
+        if pending:
+            texts = self.matcher_llm.batch(
+                [[HumanMessage(content=p["prompt"])] for p in pending]
+            )
+            for p, text in zip(pending, texts):
+                self._finish(p, text)
+        return [{"action": p["action"], "result": p["result"]} for p in plans]
+
+    def _plan(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return either a finished `{"action", "result"}` dict or, when the
+        matcher-LLM is needed, `{"action", "key", "prompt"}`.
+        """
         pid = inputs["patient_id"]
         resp = inputs["response_dict"]
         action = resp.get("action", "").lower()
@@ -57,40 +120,42 @@ class RetrieveResults(BaseTool):
         # invalid action: prompt model to use correct format
         return {"action": None, "result": "Please use the correct format to request Physical Examination, Laboratory Tests, or Imaging."}
 
+    def _finish(self, plan: Dict[str, Any], text: str) -> Dict[str, Any]:
+        text = text.replace("\n", " ")
+        self.match_cache[plan["key"]] = text
+        plan["result"] = text
+        return {"action": plan["action"], "result": text}
+
     def _physical(self, pid: str) -> Dict[str, Any]:
         findings = self.patient_data.get(pid, {})\
             .get("Physical Examination", "No physical exam data.")
         return {"action": "physical examination", "result": findings}
 
     def _labs(self, pid: str, requested: str) -> Dict[str, Any]:
-        labs = self.patient_data.get(pid, {})\
-            .get("Laboratory Tests", {})
-        available = ", ".join(f"{k}: {v}" for k, v in labs.items())
-        prompt = LABS_MATCHER_PROMPT.format(
+        available = self.labs_str.get(pid, "")
+        key = (pid, "laboratory tests", requested.strip().lower(), hash(available))
+        text = self.match_cache.get(key)
+        if text is not None:
+            return {"action": "laboratory tests", "result": text}
+        prompt = LABS_MATCHER_FMT(
             requested_tests=requested,
             available_tests=available
         )
-        text = self.matcher_llm.invoke([HumanMessage(content=prompt)])\
-            .replace("\n", " ")
-        return {"action": "laboratory tests", "result": text}
+        return {"action": "laboratory tests", "key": key, "prompt": prompt}
 
     def _imaging(self, pid: str, requested: str) -> Dict[str, Any]:
-        studies = self.patient_data.get(pid, {})\
-            .get("Radiology", [])
-        if not studies:
+        summary = self.imaging_str.get(pid)
+        if not summary:
             return {"action": "imaging", "result": "No imaging data."}
-        summary = ", ".join(
-            f"{s.get('Exam Name','?')} ({s.get('Modality','?')}): "
-            f"{s.get('Report','').replace(chr(10), ' ')}"
-            for s in studies
-        )
-        prompt = IMAGING_MATCHER_PROMPT.format(
+        key = (pid, "imaging", requested.strip().lower(), hash(summary))
+        text = self.match_cache.get(key)
+        if text is not None:
+            return {"action": "imaging", "result": text}
+        prompt = IMAGING_MATCHER_FMT(
             requested_imaging=requested,
             available_imaging=summary
         )
-        text = self.matcher_llm.invoke([HumanMessage(content=prompt)])\
-            .replace("\n", " ")
-        return {"action": "imaging", "result": text}
+        return {"action": "imaging", "key": key, "prompt": prompt}
     
     
 def make_retrieve_node(tools: Dict[str, BaseTool]):
@@ -106,16 +171,44 @@ def make_retrieve_node(tools: Dict[str, BaseTool]):
         last_msg = state["messages"][-1]
         if not hasattr(last_msg, "tool_calls"):
             return {"messages": []}
-        for call in last_msg.tool_calls:
-            tool = tools.get(call["name"])
-            if not tool:
-                continue
-            result = tool.invoke({"inputs": call["args"]})
+        calls = [c for c in last_msg.tool_calls if c["name"] in tools]
+        if not calls:
+            return {"messages": []}
+
+        def run(call):
+            return tools[call["name"]].invoke({"inputs": call["args"]})
+
+        # sibling calls each block on a matcher-LLM round-trip, so overlap them
+        workers = min(len(calls), getattr(CONFIG.runtime, "tool_concurrency", 4))
+        batchable = (
+            getattr(CONFIG.runtime, "use_batch_matcher", False)
+            and len(calls) > 1
+            and all(hasattr(tools[c["name"]], "run_batch") for c in calls)
+        )
+        if batchable:
+            results = [None] * len(calls)
+            by_tool: Dict[str, List[int]] = {}
+            for i, c in enumerate(calls):
+                by_tool.setdefault(c["name"], []).append(i)
+            for name, idx in by_tool.items():
+                batch = tools[name].run_batch([calls[i]["args"] for i in idx])
+                for i, result in zip(idx, batch):
+                    results[i] = result
+        elif workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(run, calls))
+        else:
+            results = [run(c) for c in calls]
+
+        for call, result in zip(calls, results):
+            action = result["action"]
+            # `route` is precomputed for the multi-agent `should_interpret` edge
+            route  = "interpret" if action == "laboratory tests" else "continue"
             outputs.append(ToolMessage(
-                content=json.dumps(result["result"]),
+                content=orjson.dumps(result["result"]).decode(),
                 name=call["name"],
                 tool_call_id=call["id"],
-                additional_kwargs={"action": result["action"]}
+                additional_kwargs={"action": action, "route": route}
             ))
         return {"messages": outputs}
     return node
@@ -32,7 +32,7 @@ Key sections
 """
 
 
-import json
+import orjson
 import re
 from typing import Any, Dict, List
 
@@ -59,6 +59,62 @@ class AgentState(MessagesState):
     iteration: int = 0
 
 
+# ────────────────────────────────────────────────────────────────────────────
+# Regex pre-compiles
+# ────────────────────────────────────────────────────────────────────────────
+
+_THINK_TAG_RE = re.compile(r"</?think>", re.I)
+
+# Format 1 (information gathering)
+_FORMAT1_RE = re.compile(
+    r"Thought:\s*(?P<thought>.*?)\s*\n"
+    r"Action:\s*(?P<action>[^\n]*\S[^\n]*)\s*\n"   # ← at least one non‑space
+    r"Action Input:\s*(?P<action_input>.*?)(?=\s*$|\s*\n\s*\n)",
+    re.DOTALL | re.MULTILINE
+)
+
+# Format 2 (final diagnosis)
+_FORMAT2_RE = re.compile(
+    r"(?:Thought:\s*(?P<thought>.*?)\s*\n)?"
+    r"Final Diagnosis\s*(?:\*\*?)?\s*(?:\((?:ranked|Ranked)\))?\s*:?[\s\*]*\n"
+    r"(?P<diagnosis>.*?)\n"
+    r"Treatment\s*:?\s*(?P<treatment>.*?)(?=\s*$|\n\s*\n)",
+    re.IGNORECASE | re.DOTALL
+)
+
+# Format 1 with a Lab Interpretation block
+_LAB_RE = re.compile(
+    r"Thought:\s*(?P<thought>.*?)\s*\n"
+    r"Lab Interpretation:\s*(?P<lab_interpretation>\{.*?\})\s*\n"
+    r"Action:\s*(?P<action>.*?)\s*\n"
+    r"Action Input:\s*(?P<action_input>.*?)(?=\s*$|\s*\n\s*\n)",
+    re.DOTALL | re.MULTILINE
+)
+
+
+
+def _match_at_markers(pattern: re.Pattern, text: str, haystack: str, markers: tuple):
+    """
+    Anchored `pattern.match` tried only where a marker occurs in `haystack`
+    (`text` itself, or its lowercase form for case-insensitive patterns),
+    earliest first. The patterns above open with their marker, so this finds
+    the same match as `.search` without trying every offset of a long reply.
+    """
+    if len(haystack) != len(text):  # lower() changed offsets; rare unicode
+        return pattern.search(text)
+    starts = []
+    for marker in markers:
+        pos = haystack.find(marker)
+        while pos >= 0:
+            starts.append(pos)
+            pos = haystack.find(marker, pos + 1)
+    for pos in sorted(starts):
+        match = pattern.match(text, pos)
+        if match:
+            return match
+    return None
+
+
 # ────────────────────────────────────────────────────────────────────────────
 # LLM Parsing
 # ────────────────────────────────────────────────────────────────────────────
@@ -68,53 +124,30 @@ def parse_llm_response(response: str, has_lab_results: bool = False) -> Dict[str
     Parses the LLM response to extract either Format 1 or Format 2 responses.
     Only looks for Lab Interpretation if has_lab_results is True.
     """
-    if not re.search(r"^Thought:", response, re.MULTILINE | re.IGNORECASE):
+    response = _THINK_TAG_RE.sub("", str(response or "")).strip()
+
+    # plain case-insensitive substring checks; "\nthought:" keeps the old
+    # MULTILINE "^Thought:" semantics (any line may open with it)
+    lower = response.lower()
+    if not (lower.startswith("thought:") or "\nthought:" in lower):
         # If response doesn't start with "Thought:" but has content,
         # restructure it to fit the expected format
-        if re.search(r"Action:", response, re.MULTILINE | re.IGNORECASE):
+        if "action:" in lower:
             response = "Thought: Analyzing the case.\n" + response
         else:
             # If there's no action either, treat entire text as thought
-            response = f"Thought: {response.strip()}\nAction: physical examination\nAction Input: Full physical exam"
-
-    if not isinstance(response, str):
-        response = str(response or "")
-    response = re.sub(r"</?think>", "", response, flags=re.I).strip()
-
-    # Try Format 1 first (information gathering)
-    format1_pattern = re.compile(
-        r"(?:^|\s*)Thought:\s*(?P<thought>.*?)\s*\n"
-        r"Action:\s*(?P<action>[^\n]*\S[^\n]*)\s*\n"   # ← at least one non‑space
-        r"Action Input:\s*(?P<action_input>.*?)(?=\s*$|\s*\n\s*\n)",
-        re.DOTALL | re.MULTILINE
-    )
-    
-    # Try Format 2 (final diagnosis)
-    format2_pattern = re.compile(
-    r"(?:(?:^|\s*)Thought:\s*(?P<thought>.*?)\s*\n)?"
-    r"Final Diagnosis\s*(?:\*\*?)?\s*(?:\((?:ranked|Ranked)\))?\s*:?[\s\*]*\n"
-    r"(?P<diagnosis>.*?)\n"
-    r"Treatment\s*:?\s*(?P<treatment>.*?)(?=\s*$|\n\s*\n)",
-    re.IGNORECASE | re.DOTALL
-    )
-    
+            response = f"Thought: {response}\nAction: physical examination\nAction Input: Full physical exam"
+
     # If we're expecting lab results, try to parse with Lab Interpretation
     if has_lab_results:
-        lab_pattern = re.compile(
-            r"(?:^|\s*)Thought:\s*(?P<thought>.*?)\s*\n"
-            r"Lab Interpretation:\s*(?P<lab_interpretation>\{.*?\})\s*\n"
-            r"Action:\s*(?P<action>.*?)\s*\n"
-            r"Action Input:\s*(?P<action_input>.*?)(?=\s*$|\s*\n\s*\n)",
-            re.DOTALL | re.MULTILINE
-        )
-        match = lab_pattern.search(response)
+        match = _match_at_markers(_LAB_RE, response, response, ("Thought:",))
         if match:
             lab_interpretation = match.group("lab_interpretation")
             try:
                 # Try to parse and reformat the JSON to ensure it's valid
-                lab_json = json.loads(lab_interpretation)
-                lab_interpretation = json.dumps(lab_json, indent=2)
-            except json.JSONDecodeError:
+                lab_json = orjson.loads(lab_interpretation)
+                lab_interpretation = orjson.dumps(lab_json, option=orjson.OPT_INDENT_2).decode()
+            except orjson.JSONDecodeError:
                 lab_interpretation = ""
             
             return {
@@ -126,7 +159,7 @@ def parse_llm_response(response: str, has_lab_results: bool = False) -> Dict[str
             }
     
     # Check Format 1 (without Lab Interpretation)
-    match = format1_pattern.search(response)
+    match = _match_at_markers(_FORMAT1_RE, response, response, ("Thought:",))
     if match:
         return {
             "thought": (match.group("thought") or "").strip(),
@@ -137,7 +170,9 @@ def parse_llm_response(response: str, has_lab_results: bool = False) -> Dict[str
         }
     
     # Check Format 2
-    match = format2_pattern.search(response)
+    match = _match_at_markers(
+        _FORMAT2_RE, response, response.lower(), ("thought:", "final diagnosis")
+    )
     if match:
         return {
             "thought": (match.group("thought") or "").strip(),
@@ -159,12 +194,19 @@ def parse_llm_response(response: str, has_lab_results: bool = False) -> Dict[str
     }
 
 
+# constant system prompts, shared by every turn of every run
+_SYS_MSG  = SystemMessage(content=SYSTEM_PROMPT)
+_DIAG_MSG = SystemMessage(content=DIAGNOSIS_PROMPT)
+
+# constant part of every Retrieve Results tool call
+_TOOL_CALL_TEMPLATE = {"name": "Retrieve Results", "id": "0"}
+
+
 def extract_tool_calls(response_dict: Dict[str, Any], patient_id: str) -> List[Dict[str, Any]]:
     if response_dict.get("tool_call") and response_dict.get("action"):
         return [{
-            "name": "Retrieve Results",
+            **_TOOL_CALL_TEMPLATE,
             "args": {"patient_id": patient_id, "response_dict": response_dict},
-            "id":   "0",
         }]
     return []
 
@@ -175,16 +217,16 @@ def call_model(state: Dict[str, Any], llm: Any) -> Dict[str, Any]:
     iteration  = state["iteration"]
 
     # detect if last AI asked for labs, and we now have a ToolMessage
+    # (the action was parsed when that AIMessage was built; see below)
     has_lab = (
         len(messages) >= 2
         and isinstance(messages[-1], ToolMessage)
         and isinstance(messages[-2], AIMessage)
-        and parse_llm_response(messages[-2].content, False).get("action") == "laboratory tests"
+        and messages[-2].additional_kwargs.get("parsed_action") == "laboratory tests"
     )
 
     # pick system vs diagnosis prompt
-    sys_msg = SystemMessage(content=DIAGNOSIS_PROMPT) if iteration >= CONFIG.runtime.max_iterations \
-              else SystemMessage(content=SYSTEM_PROMPT)
+    sys_msg = _DIAG_MSG if iteration >= CONFIG.runtime.max_iterations else _SYS_MSG
     prompt  = [sys_msg] + messages
 
     raw = llm.invoke(prompt)
@@ -201,7 +243,7 @@ def call_model(state: Dict[str, Any], llm: Any) -> Dict[str, Any]:
         parts.append(f"Action Input: {pr['action_input']}")
         formatted = "\n".join(parts)
 
-    ai_msg = AIMessage(content=formatted)
+    ai_msg = AIMessage(content=formatted, additional_kwargs={"parsed_action": pr.get("action", "")})
     ai_msg.tool_calls = extract_tool_calls(pr, patient_id)
     return {"messages": [ai_msg], "iteration": iteration + 1}
 
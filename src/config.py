@@ -5,7 +5,8 @@
 # This module reads the `config.yaml` file located in the project root,
 # parses its contents, and converts the nested dictionary structure into
 # a Python object with attribute‐style access. All configuration values
-# can then be accessed via the global `CONFIG` constant, e.g.:
+# can then be accessed via the global `CONFIG` constant (parsed lazily on
+# first attribute access), e.g.:
 #
 #     from config import CONFIG
 #     print(CONFIG.api_keys.openai)
@@ -18,9 +19,15 @@
 
 
 import yaml
+from functools import cache
 from pathlib import Path
 from types import SimpleNamespace
 
+try:  # libyaml-backed loader when available
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
 # Path to the YAML configuration file
 PROJECT_ROOT = Path(__file__).parent.parent
 _CONFIG_PATH  = PROJECT_ROOT / "config.yaml"
@@ -37,9 +44,31 @@ def _to_namespace(data):
     return data
 
 
-# Load and parse the YAML file once at import time
-with open(_CONFIG_PATH, "r") as f:
-    _raw_config = yaml.safe_load(f)
+@cache
+def get_config() -> SimpleNamespace:
+    """Load and parse the YAML file once, on first use."""
+    with open(_CONFIG_PATH, "r") as f:
+        return _to_namespace(yaml.load(f, Loader=_Loader))
+
+
+class _LazyConfig:
+    """
+    Stand-in for the parsed namespace: `from config import CONFIG` stays
+    cheap, and the YAML is only read on the first attribute access. That
+    access copies the top-level sections into the instance `__dict__`, so
+    later lookups (`CONFIG.runtime.max_iterations` on every agent turn) are
+    plain attribute hits that never reach `__getattr__` again.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        self.__dict__.update(vars(get_config()))
+        return getattr(get_config(), name)
+
+    def __repr__(self) -> str:
+        return repr(get_config())
+
 
 # Expose the configuration as a constant namespace
-CONFIG = _to_namespace(_raw_config)
+CONFIG = _LazyConfig()
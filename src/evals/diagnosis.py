@@ -4,9 +4,10 @@
 Pathology name mappings and diagnosis evaluation utilities.
 """
 
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, Tuple
 from src.utils.nlp import keyword_positive, remove_punctuation, is_negated
-from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz, process
 import re
 from src.utils.logging import console, file_console
 
@@ -46,9 +47,94 @@ GRACIOUS_ALTERNATIVE_PATHOLOGY_NAMES: Dict[str, List[Dict[str, List[str]]]] = {
     "pancreatitis": [],
 }
 
+# -----------------------------------------------------------------------------
+# Pre-compiled parsing patterns
+# -----------------------------------------------------------------------------
+_RANKED_BLOCK_RE = re.compile(
+    r"\**Final Diagnosis\s*\(ranked\)\s*:\**\s*\n(.*?)(?=\n\s*\n|Treatment:)",
+    re.IGNORECASE | re.DOTALL
+)
+_NUMBERED_RE     = re.compile(
+    r'^\s*(\d+)[\.:\)]\s*(.*?)(?=^\s*\d+[\.:\)]|$)',
+    re.MULTILINE | re.DOTALL
+)
+_DIAG_HEAD_RE    = re.compile(r'^(.*?)(?:\s+-+\s+|\s*:\s+).*$')
+_FINAL_BLOCK_RE  = re.compile(
+    r"Final Diagnosis\s*:\s*(.*?)(?=\n\s*\n|Treatment:)",
+    re.IGNORECASE | re.DOTALL
+)
+_STOP_LINE_RE    = re.compile(r"(treatment|thought)\b", re.I)
+_NUM_PREFIX_RE   = re.compile(r"^\d+\.\s*")
+_DASH_COLON_RE   = re.compile(r"[-:]")
+
+_FINAL_DIAG_RE   = re.compile(r"Final Diagnosis:\s*\**([A-Za-z\s\-]+)\**", re.IGNORECASE)
+_LLAMA_INTRO_RE  = re.compile(r"^Based on.*:\n\n")
+_SECTIONS = [
+    "rationale", "note", "recommendation", "explanation",
+    "finding", "other.*diagnos.*include", "other.*diagnos.*considered(?: were)?",
+    "management", "action", "plan", "reasoning", "assessment",
+    "justification", "tests", "additional diagnoses", "notification",
+    "impression", "background", "additional findings include",
+]
+# One alternation instead of a pass per section: every branch strips to the end
+# of the string, so the leftmost hit across all sections decides the cut.
+_SECTIONS_RE     = re.compile(
+    r"(?:" + "|".join(sorted(_SECTIONS, key=len, reverse=True)) + r")[s]?:.*",
+    re.IGNORECASE | re.DOTALL
+)
+_NUM_LIST_RE     = re.compile(r"^1\.(.*)", re.MULTILINE)
+_STAR_LIST_RE    = re.compile(r"^\*(.*)", re.MULTILINE)
+_AFTER_DASH_RE   = re.compile(r"[-:].*")
+_AFTER_BULLET_RE = re.compile(r"[-:] .*")
+_TRAILING_RE     = re.compile(r"\n\n.*")
+_IN_SENTENCE_RE  = re.compile(r".*?diagnosis[^.\n]*?\bis\b(.*?)[.\n]", re.DOTALL)
+_PATIENT_HAS_RE  = re.compile(r".*?patient has", re.DOTALL)
+_MULTI_DIAG_RE   = re.compile(r"[,.\n]|(?:\s*\b(?:and|or|vs[.]?)\b\s*)")
+
+
+def _compile_alternatives(
+    names: Dict[str, List[Dict[str, List[str]]]]
+) -> Dict[str, List[Tuple["re.Pattern", str, List[str]]]]:
+    """
+    One pattern per (location, modifiers) entry that hits only when the
+    location and at least one of its modifiers both occur, in any order
+    (lookaheads, so overlapping hits such as cholangitis/cholangitis count).
+    """
+    compiled = {}
+    for pathology, alts in names.items():
+        compiled[pathology] = []
+        for alt in alts:
+            loc  = re.escape(alt["location"])
+            mods = "|".join(re.escape(m) for m in alt["modifiers"])
+            pattern = re.compile(rf"(?=.*?{loc})(?=.*?(?:{mods}))", re.DOTALL)
+            compiled[pathology].append((pattern, alt["location"], alt["modifiers"]))
+    return compiled
+
+
+_ALT_REGEX          = _compile_alternatives(ALTERNATIVE_PATHOLOGY_NAMES)
+_GRACIOUS_ALT_REGEX = _compile_alternatives(GRACIOUS_ALTERNATIVE_PATHOLOGY_NAMES)
+
+
+def _alternative_match(alts, diagnosis: str, diagnosis_clean: str) -> bool:
+    """True if any (location, modifier) pair is present and neither is negated."""
+    for pattern, patho_loc, modifiers in alts:
+        if not pattern.match(diagnosis_clean):
+            continue
+        for patho_mod in modifiers:
+            if (
+                patho_mod in diagnosis_clean
+                and keyword_positive(diagnosis, patho_loc)
+                and keyword_positive(diagnosis, patho_mod)
+            ):
+                return True
+    return False
+
+
+@lru_cache(maxsize=4096)
 def check_diagnosis_match(correct_diagnosis: str, diagnosis: str) -> bool:
     """
     Performs fuzzy matching, negation checking, and alternative diagnosis evaluation.
+    Results are memoized per (correct_diagnosis, diagnosis) pair.
     
     Args:
         correct_diagnosis (str): The primary correct diagnosis.
@@ -62,53 +148,31 @@ def check_diagnosis_match(correct_diagnosis: str, diagnosis: str) -> bool:
     correct_diagnosis = correct_diagnosis.lower()
     diagnosis = diagnosis.lower()
 
-    alternative_names = ALTERNATIVE_PATHOLOGY_NAMES[correct_diagnosis]
-    gracious_alternative_names = GRACIOUS_ALTERNATIVE_PATHOLOGY_NAMES[correct_diagnosis]
-
     # Remove punctuation before checking
     diagnosis_clean = remove_punctuation(diagnosis)
 
-    # Use fuzzy substring matching for primary pathology name
-    similarity_score = fuzz.partial_ratio(correct_diagnosis, diagnosis_clean)
+    # Use fuzzy substring matching for primary pathology name; a verbatim hit
+    # already scores 100, so skip the fuzzy kernel in that (common) case
+    if correct_diagnosis in diagnosis_clean:
+        similarity_score = 100
+    else:
+        similarity_score = fuzz.partial_ratio(correct_diagnosis, diagnosis_clean)
     is_present = similarity_score > 90  # High similarity threshold
 
-    # Check if the diagnosis is negated
-    is_negated_diagnosis = is_negated(diagnosis, correct_diagnosis)
+    # Check if the diagnosis is negated; only decides anything when the gold
+    # name is present, so the spaCy pass is skipped for absent diagnoses
+    is_negated_diagnosis = is_present and is_negated(diagnosis, correct_diagnosis)
 
     # Initial correctness check: Must be present and NOT negated
     is_correct = is_present and not is_negated_diagnosis
 
     # Check alternative pathology names
     if not is_correct:
-        for alt in alternative_names:
-            patho_loc = alt["location"]
-            for patho_mod in alt["modifiers"]:
-                if (
-                    patho_loc in diagnosis_clean
-                    and patho_mod in diagnosis_clean
-                    and keyword_positive(diagnosis, patho_loc)
-                    and keyword_positive(diagnosis, patho_mod)
-                ):
-                    is_correct = True
-                    break
-            if is_correct:
-                break
+        is_correct = _alternative_match(_ALT_REGEX[correct_diagnosis], diagnosis, diagnosis_clean)
 
     # Check gracious alternative pathology names (for more lenient matches)
     if not is_correct:
-        for gracious_alt in gracious_alternative_names:
-            patho_loc = gracious_alt["location"]
-            for patho_mod in gracious_alt["modifiers"]:
-                if (
-                    patho_loc in diagnosis_clean
-                    and patho_mod in diagnosis_clean
-                    and keyword_positive(diagnosis, patho_loc)
-                    and keyword_positive(diagnosis, patho_mod)
-                ):
-                    is_correct = True
-                    break
-            if is_correct:
-                break
+        is_correct = _alternative_match(_GRACIOUS_ALT_REGEX[correct_diagnosis], diagnosis, diagnosis_clean)
 
     # Debug print for logging results
     console.print(
@@ -127,9 +191,11 @@ def check_diagnosis_match(correct_diagnosis: str, diagnosis: str) -> bool:
 
     return is_correct
 
+@lru_cache(maxsize=None)
 def match_pathology(diagnosis: str) -> str:
     """
     Matches a diagnosis to one of the predefined pathologies using fuzzy matching.
+    Results are memoized, since gold diagnoses repeat across patients.
     
     Args:
         diagnosis (str): The diagnosis text to match.
@@ -137,9 +203,20 @@ def match_pathology(diagnosis: str) -> str:
     Returns:
         str: The matched pathology name if found, None otherwise.
     """
+    diagnosis = diagnosis.lower()
+    # verbatim hits score 100, the maximum, so the first one in list order is
+    # exactly what extractOne would return; fuzzy scoring only covers typos
     for pathology in PATHOLOGIES:
-        if fuzz.partial_ratio(diagnosis.lower(), pathology) > 80:
+        if pathology in diagnosis:
             return pathology
+
+    # one C-level pass over all candidates; ties resolve in PATHOLOGIES order
+    best = process.extractOne(
+        diagnosis, PATHOLOGIES,
+        scorer=fuzz.partial_ratio, processor=None, score_cutoff=80
+    )
+    if best and best[1] > 80:
+        return best[0]
     return None
 
 def parse_ranked_diagnoses(text: str) -> List[str]:
@@ -150,24 +227,20 @@ def parse_ranked_diagnoses(text: str) -> List[str]:
     Returns:
         List[str]: List of up to 5 distinct diagnoses.
     """
-    ranked_block = re.search(
-        r"\**Final Diagnosis\s*\(ranked\)\s*:\**\s*\n(.*?)(?=\n\s*\n|Treatment:)",
-        text,
-        re.IGNORECASE | re.DOTALL
-    )
+    # every pattern below needs this marker; skip them all when it is absent
+    if "final diagnosis" not in text.lower():
+        return []
+
+    ranked_block = _RANKED_BLOCK_RE.search(text)
     
     if ranked_block:
         diagnosis_content = ranked_block.group(1)
-        numbered_diagnoses = re.findall(
-            r'^\s*(\d+)[\.:\)]\s*(.*?)(?=^\s*\d+[\.:\)]|$)', 
-            diagnosis_content,
-            re.MULTILINE | re.DOTALL
-        )
+        numbered_diagnoses = _NUMBERED_RE.findall(diagnosis_content)
         if numbered_diagnoses:
             diags = []
             for num, diag in numbered_diagnoses:
                 diag = diag.strip()
-                match = re.search(r'^(.*?)(?:\s+-+\s+|\s*:\s+).*$', diag)
+                match = _DIAG_HEAD_RE.search(diag)
                 if match:
                     diag = match.group(1).strip()
                 cleaned = remove_punctuation(diag.lower())
@@ -178,11 +251,7 @@ def parse_ranked_diagnoses(text: str) -> List[str]:
             if diags:
                 return diags
 
-    block = re.search(
-        r"Final Diagnosis\s*:\s*(.*?)(?=\n\s*\n|Treatment:)",
-        text,
-        re.IGNORECASE | re.DOTALL,
-    )
+    block = _FINAL_BLOCK_RE.search(text)
     if not block:
         return []
 
@@ -194,10 +263,10 @@ def parse_ranked_diagnoses(text: str) -> List[str]:
 
     diags = []
     for ln in raw_lines:
-        if re.match(r"(treatment|thought)\b", ln, re.I):
+        if _STOP_LINE_RE.match(ln):
             break
-        ln = re.sub(r"^\d+\.\s*", "", ln)
-        ln = re.split(r"[-:]", ln, 1)[0].strip()
+        ln = _NUM_PREFIX_RE.sub("", ln)
+        ln = _DASH_COLON_RE.split(ln, 1)[0].strip()
         cleaned = remove_punctuation(ln.lower())
         if cleaned and cleaned not in diags:
             diags.append(cleaned)
@@ -211,68 +280,57 @@ def parse_diagnosis(prediction: str) -> str:
     Takes prediction string and parses it for a single diagnosis.
     """
     custom_parsing = False
-    regex = r"Final Diagnosis:\s*\**([A-Za-z\s\-]+)\**"
 
-    matches = re.findall(regex, prediction, flags=re.IGNORECASE)
+    if "final diagnosis:" not in prediction.lower():
+        return ""
+
+    matches = _FINAL_DIAG_RE.findall(prediction)
     if matches:
         diagnosis = matches[-1].strip()
 
         # Remove Llama2 Chat intros
         modify_check = diagnosis
-        diagnosis = re.sub(r"^Based on.*:\n\n", "", diagnosis)
+        diagnosis = _LLAMA_INTRO_RE.sub("", diagnosis)
         if modify_check != diagnosis:
             custom_parsing = True
 
         # Strip extra sections
-        for section in [
-            "rationale", "note", "recommendation", "explanation",
-            "finding", "other.*diagnos.*include", "other.*diagnos.*considered(?: were)?",
-            "management", "action", "plan", "reasoning", "assessment",
-            "justification", "tests", "additional diagnoses", "notification",
-            "impression", "background", "additional findings include",
-        ]:
-            diagnosis = re.sub(
-                rf"{section}[s]?:.*", "", diagnosis,
-                flags=re.IGNORECASE | re.DOTALL
-            )
+        diagnosis = _SECTIONS_RE.sub("", diagnosis)
 
         # Lists with numbers
-        match = re.search(r"^1\.(.*)", diagnosis, flags=re.MULTILINE)
+        match = _NUM_LIST_RE.search(diagnosis)
         if match:
             diagnosis = match.group(1).strip()
             custom_parsing = True
-            diagnosis = re.sub(r"[-:].*", "", diagnosis)
+            diagnosis = _AFTER_DASH_RE.sub("", diagnosis)
 
         # Lists with stars
-        match = re.search(r"^\*(.*)", diagnosis, flags=re.MULTILINE)
+        match = _STAR_LIST_RE.search(diagnosis)
         if match:
             diagnosis = match.group(1).strip()
             custom_parsing = True
-            diagnosis = re.sub(r"[-:] .*", "", diagnosis)
+            diagnosis = _AFTER_BULLET_RE.sub("", diagnosis)
 
         # Remove trailing explanation
         modify_check = diagnosis
-        diagnosis = re.sub(r"\n\n.*", "", diagnosis)
+        diagnosis = _TRAILING_RE.sub("", diagnosis)
         if modify_check != diagnosis:
             custom_parsing = True
 
         # In-sentence extraction
-        match = re.search(
-            r".*?diagnosis[^.\n]*?\bis\b(.*?)[.\n]", diagnosis,
-            flags=re.DOTALL
-        )
+        match = _IN_SENTENCE_RE.search(diagnosis)
         if match:
             diagnosis = match.group(1).strip()
             custom_parsing = True
 
         # "patient has" removal
         modify_check = diagnosis
-        diagnosis = re.sub(r".*?patient has", "", diagnosis, count=1, flags=re.DOTALL)
+        diagnosis = _PATIENT_HAS_RE.sub("", diagnosis, count=1)
         if modify_check != diagnosis:
             custom_parsing = True
 
         # Split multiple diagnoses—take first
-        diagnoses = re.split(r"[,.\n]|(?:\s*\b(?:and|or|vs[.]?)\b\s*)", diagnosis)
+        diagnoses = _MULTI_DIAG_RE.split(diagnosis)
         diagnoses = [d for d in diagnoses if d]
         if len(diagnoses) > 1:
             custom_parsing = True
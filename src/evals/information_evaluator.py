@@ -9,14 +9,21 @@ Compute coverage and efficiency metrics for model information‐gathering behavi
 recommendations for four acute intra-abdominal pathologies.
 """
 
+import sys
+from array import array
 from collections import defaultdict
+from typing import NamedTuple
 
-from thefuzz import fuzz
+import numpy as np
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
 
 from .recommended_tests import (
     GUIDELINE_LAB_TESTS,
     GUIDELINE_IMAGING_TESTS,
+    GUIDELINE_IMAGING_SETS,
     PHYSICAL_EXAM_MANEUVER_SYNONYMS,
+    PHYSICAL_EXAM_MANEUVER_SETS,
 )
 
 
@@ -28,10 +35,127 @@ def exact_or_fuzzy_match(user_str: str, ref_str: str, threshold: int = 80) -> bo
     """
     user_str = user_str.lower().strip()
     ref_str = ref_str.lower().strip()
+    if user_str == ref_str:
+        return True
 
-    token_score = fuzz.token_set_ratio(user_str, ref_str)
-    partial_score = fuzz.partial_ratio(user_str, ref_str)
-    return max(token_score, partial_score) >= threshold
+    # thefuzz ran token_set_ratio through its default processor; keep that
+    token_score = fuzz.token_set_ratio(user_str, ref_str, processor=default_process,
+                                       score_cutoff=threshold)
+    if token_score >= threshold:
+        return True
+    return fuzz.partial_ratio(user_str, ref_str, score_cutoff=threshold) >= threshold
+
+
+class StringPool(NamedTuple):
+    """A list of strings normalised once for every scorer that sees them."""
+    lower: list[str]        # lowercased/stripped (exact pass, partial_ratio)
+    exact: frozenset        # set of `lower`
+    processed: list[str]    # default_process(lower) (token_set_ratio)
+
+
+def string_pool(strings: list[str], intern: bool = False) -> StringPool:
+    """Normalise `strings`; `intern` for long-lived reference tables."""
+    lower = [s.lower().strip() for s in strings]
+    processed = [default_process(s) for s in lower]
+    if intern:
+        lower = [sys.intern(s) for s in lower]
+        processed = [sys.intern(s) for s in processed]
+    return StringPool(lower, frozenset(lower), processed)
+
+
+def _any_match_pooled(users: StringPool, refs: StringPool, threshold: int) -> bool:
+    """
+    Vectorised `exact_or_fuzzy_match` over every (user, ref) pair of two
+    pre-normalised pools: True if any pair reaches the threshold. Both score
+    matrices are computed in C.
+    """
+    if not users.lower or not refs.lower:
+        return False
+    # exact pass first: a verbatim synonym needs no edit-distance at all
+    if not refs.exact.isdisjoint(users.lower):
+        return True
+    token = process.cdist(users.processed, refs.processed, scorer=fuzz.token_set_ratio,
+                          score_cutoff=threshold)
+    if (token >= threshold).any():
+        return True
+    partial = process.cdist(users.lower, refs.lower, scorer=fuzz.partial_ratio, score_cutoff=threshold)
+    return bool((partial >= threshold).any())
+
+
+# lowercased once at import; the guideline tables never change at run time
+_MANEUVER_SYNONYMS = {
+    pathology: [s.lower() for s in synonyms]
+    for pathology, synonyms in PHYSICAL_EXAM_MANEUVER_SYNONYMS.items()
+}
+
+
+_EMPTY_POOL = StringPool([], frozenset(), [])
+
+
+def _synonym_pool(defs: list[dict]) -> StringPool:
+    """Flatten canonical + contained_in names into one interned pool."""
+    syns = []
+    for d in defs:
+        syns.append(d["canonical"])
+        syns.extend(d.get("contained_in", []))
+    return string_pool(syns, intern=True)
+
+
+_LEAF = object()   # trie key holding the (category, canonical) tuples of a phrase ending here
+
+
+def build_imaging_trie(categories: list[dict]) -> dict:
+    """
+    Character trie (dict of dicts) over every lowercased imaging phrase of a
+    pathology. Canonical names recur across pathologies, so the tags hold
+    interned copies; the guideline tables themselves are left untouched.
+    """
+    trie = {}
+    for cat in categories:
+        for opt in cat["options"]:
+            # one tuple shared by every phrase of the option
+            tag = (sys.intern(cat["category"]), sys.intern(opt["canonical"]))
+            for phrase in [opt["canonical"], *opt.get("contained_in", [])]:
+                node = trie
+                for ch in phrase.lower().strip():
+                    node = node.setdefault(ch, {})
+                node.setdefault(_LEAF, []).append(tag)
+    return trie
+
+
+def trie_hits(text: str, trie: dict):
+    """Yield (category, canonical) for every trie phrase occurring inside `text`."""
+    for start in range(len(text)):
+        node = trie
+        for ch in text[start:]:
+            node = node.get(ch)
+            if node is None:
+                break
+            if _LEAF in node:
+                yield from node[_LEAF]
+
+
+# pathology -> imaging phrase trie; a request containing a phrase verbatim has
+# partial_ratio 100, so a hit settles coverage without any fuzzy scoring
+_IMAGING_TRIE = {
+    pathology: build_imaging_trie(cats)
+    for pathology, cats in GUIDELINE_IMAGING_TESTS.items()
+}
+
+
+def _matched_refs(users: StringPool, refs: StringPool, threshold: int) -> np.ndarray:
+    """Boolean mask over `refs`: which are matched by at least one user string."""
+    if not users.lower or not refs.lower:
+        return np.zeros(len(refs.lower), dtype=bool)
+    hits  = np.fromiter((r in users.exact for r in refs.lower), dtype=bool, count=len(refs.lower))
+    token = process.cdist(users.processed, refs.processed, scorer=fuzz.token_set_ratio,
+                          score_cutoff=threshold)
+    hits |= token.max(axis=0) >= threshold
+    if hits.all():
+        return hits
+    partial = process.cdist(users.lower, refs.lower, scorer=fuzz.partial_ratio,
+                            score_cutoff=threshold)
+    return hits | (partial.max(axis=0) >= threshold)
 
 
 def correct_maneuver_requested(requested_maneuvers: list[str], pathology: str, threshold: int = 80) -> bool:
@@ -40,14 +164,16 @@ def correct_maneuver_requested(requested_maneuvers: list[str], pathology: str, t
     physical exam maneuver appears in the requested maneuvers list,
     using fuzzy matching.
     """
-    synonyms = PHYSICAL_EXAM_MANEUVER_SYNONYMS.get(pathology, [])
+    synonyms = _MANEUVER_SYNONYMS.get(pathology, [])
+    if not requested_maneuvers or not synonyms:
+        return False
     requested_lower = [m.lower().strip() for m in requested_maneuvers]
-
-    for maneuver in requested_lower:
-        for synonym in synonyms:
-            if fuzz.partial_ratio(maneuver, synonym.lower()) >= threshold:
-                return True
-    return False
+    # verbatim synonym: partial_ratio would be 100, no need to score
+    if not PHYSICAL_EXAM_MANEUVER_SETS[pathology].isdisjoint(requested_lower):
+        return True
+    scores = process.cdist(requested_lower, synonyms,
+                           scorer=fuzz.partial_ratio, score_cutoff=threshold)
+    return bool((scores >= threshold).any())
 
 
 class InformationRequestEvaluator:
@@ -70,13 +196,32 @@ class InformationRequestEvaluator:
         # === Coverage ===
         self.total_possible_to_cover = 0
         self.total_model_covered = 0 
-        self.coverage_scores = []
+        self.coverage_scores = array("d")   # unboxed per-patient ratios
         
         # === Efficiency ===
         self.total_maneuvers = 0
         self.total_labs = 0 
         self.total_imaging = 0 
 
+        # === Precomputed synonym tables ===
+        # pathology -> (all lab synonyms as one pool, category index per
+        # synonym, number of categories), scored with a single cdist
+        self._lab_syns = {}
+        for pathology, cats in GUIDELINE_LAB_TESTS.items():
+            pools = [_synonym_pool(cat["tests"]) for cat in cats]
+            lower = [s for p in pools for s in p.lower]
+            processed = [s for p in pools for s in p.processed]
+            cat_idx = np.repeat(np.arange(len(pools)), [len(p.lower) for p in pools])
+            self._lab_syns[pathology] = (
+                StringPool(lower, frozenset(lower), processed), cat_idx, len(pools)
+            )
+        # pathology -> pool over the distinct imaging names; coverage is an
+        # any-match, so repeated synonyms would only add cdist columns
+        self._imaging_syns = {
+            pathology: string_pool(sorted(names), intern=True)
+            for pathology, names in GUIDELINE_IMAGING_SETS.items()
+        }
+
     def update(self,
                pathology: str,
                requested_labs: list[str],
@@ -87,65 +232,42 @@ class InformationRequestEvaluator:
         """
         Update the stats for a single patient encounter 
         """
-        
-        # Update Efficiency Metrics 
-        self.total_patients += 1
-        self.total_physical_exams += physical_exam_count
-        self.total_maneuvers += len(requested_maneuvers)
-        self.total_labs += len(requested_labs)
-        self.total_imaging += len(requested_imaging)
-        if requested_labs:
-            self.num_patients_with_requested_labs += 1
-        if requested_imaging:
-            self.num_patients_with_requested_imaging += 1
-        
+        scores = self.score(pathology, requested_labs, requested_imaging, requested_maneuvers)
+        self.record(requested_labs, requested_imaging, requested_maneuvers,
+                    physical_exam_count, scores)
+
+    def score(self,
+              pathology: str,
+              requested_labs: list[str],
+              requested_imaging: list[str],
+              requested_maneuvers: list[str]) -> tuple[int, int, int, int]:
+        """
+        Coverage scores for one patient, without touching any counters (safe to
+        run in a worker process; fold the result in with `record`).
+
+        Returns (covered_lab_categories, total_lab_categories, imaging_score,
+        maneuver_score).
+        """
         # Update Lab Metrics 
-        recommended_labs = GUIDELINE_LAB_TESTS.get(pathology, [])
-        total_lab_categories = len(recommended_labs)
-        covered_lab_categories = 0 
+        lab_synonyms, cat_idx, total_lab_categories = self._lab_syns.get(
+            pathology, (_EMPTY_POOL, np.zeros(0, dtype=int), 0)
+        )
         
         # We are calculating coverage per category and not per test 
-        for category_info in recommended_labs:
-            category_covered = False
-            for test_def in category_info["tests"]:
-                canonical = test_def["canonical"].lower()
-                synonyms = [canonical] + [x.lower() for x in test_def.get("contained_in", [])]
-
-                found = any(
-                    exact_or_fuzzy_match(req_lab, syn, self.fuzzy_threshold)
-                    for req_lab in requested_labs
-                    for syn in synonyms
-                )
-                if found:
-                    category_covered = True
-                    break
-
-            if category_covered:
-                covered_lab_categories += 1
+        # (a category is covered if any synonym of any of its tests matches)
+        hits = _matched_refs(string_pool(requested_labs), lab_synonyms, self.fuzzy_threshold)
+        covered_lab_categories = int(np.unique(cat_idx[hits]).size)
                 
         # Update Imaging Metrics 
         # Is one of the recmmended imaging requested?
-        recommended_imaging = GUIDELINE_IMAGING_TESTS.get(pathology, [])
-        all_imaging_options = []
-        for cat_info in recommended_imaging:
-            # gives a list of imaging definitions
-            all_imaging_options.extend(cat_info["options"])
-            
-        imaging_covered = False 
-        for opt_def in all_imaging_options:
-            canonical = opt_def["canonical"].lower()
-            synonyms = [canonical] + [x.lower() for x in opt_def.get("contained_in", [])]
-
-            found = any(
-                exact_or_fuzzy_match(req_img, syn, self.fuzzy_threshold)
-                for req_img in requested_imaging
-                for syn in synonyms
-            )
-            if found:
-                imaging_covered = True
-                break
-            
+        imaging_synonyms = self._imaging_syns.get(pathology, _EMPTY_POOL)
+        imaging_pool = string_pool(requested_imaging)
+        trie = _IMAGING_TRIE.get(pathology, {})
+        imaging_covered = any(
+            next(trie_hits(req, trie), None) is not None for req in imaging_pool.lower
+        ) or _any_match_pooled(imaging_pool, imaging_synonyms, self.fuzzy_threshold)
             
+
         imaging_score = 1 if imaging_covered else 0
         # TODO: Is there a way to evaluate ordering of imaging requests?
          
@@ -153,6 +275,28 @@ class InformationRequestEvaluator:
         maneuver_score = 1 if correct_maneuver_requested(
             requested_maneuvers, pathology, threshold=self.fuzzy_threshold
         ) else 0
+
+        return covered_lab_categories, total_lab_categories, imaging_score, maneuver_score
+
+    def record(self,
+               requested_labs: list[str],
+               requested_imaging: list[str],
+               requested_maneuvers: list[str],
+               physical_exam_count: int,
+               scores: tuple[int, int, int, int]) -> None:
+        """Fold one patient's request counts and `score` result into the totals."""
+        covered_lab_categories, total_lab_categories, imaging_score, maneuver_score = scores
+
+        # Update Efficiency Metrics 
+        self.total_patients += 1
+        self.total_physical_exams += physical_exam_count
+        self.total_maneuvers += len(requested_maneuvers)
+        self.total_labs += len(requested_labs)
+        self.total_imaging += len(requested_imaging)
+        if requested_labs:
+            self.num_patients_with_requested_labs += 1
+        if requested_imaging:
+            self.num_patients_with_requested_imaging += 1
         
         # Overall Coverage Score
         # Each lab category is 1 point if covered; imaging is 1 point if covered; 
@@ -199,7 +343,7 @@ class InformationRequestEvaluator:
 
         # Coverage Metrics:
         if self.coverage_scores:
-            avg_coverage = sum(self.coverage_scores) / len(self.coverage_scores)
+            avg_coverage = float(np.frombuffer(self.coverage_scores, dtype=np.float64).mean())
         else:
             avg_coverage = 0.0
         overall_coverage = (self.total_model_covered / self.total_possible_to_cover) if self.total_possible_to_cover else 0.0
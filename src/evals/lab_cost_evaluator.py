@@ -9,11 +9,15 @@ and then accumulates both per‐patient and dataset‐level cost metrics.
 """
 
 import re
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Sequence, NamedTuple, Optional
 
 import pandas as pd
-from fuzzywuzzy import process, fuzz
+from rapidfuzz import process, fuzz
+from rapidfuzz.utils import default_process
+
+from src.utils.logging import console
 
 # by default, point to <repo_root>/data/CLFS 2025 Q2V1.csv
 REPO_ROOT    = Path(__file__).resolve().parents[2]
@@ -47,64 +51,148 @@ def load_clfs(clfs_path: Path = None) -> pd.DataFrame:
         skiprows=header_row,
         dtype=str,
         encoding="latin1",
-        engine="python"
+        engine="c"
     )
-    df["RATE"] = df["RATE"].astype(float)
+    df["RATE"] = pd.to_numeric(df["RATE"], errors="coerce")
+    # a NaN rate would poison every patient total it is added to (and turn
+    # into null in the orjson eval cache), so drop unparseable rows up front
+    bad = int(df["RATE"].isna().sum())
+    if bad:
+        console.log(f"[yellow]Dropping {bad} CLFS row(s) with a non-numeric RATE from {path}")
+        df = df.dropna(subset=["RATE"])
     return df
 
+_PUNCT_RE = re.compile(r"[(),]")
+_SPACE_RE = re.compile(r"\s+")
+
+@lru_cache(maxsize=8192)
 def clean(text: str) -> str:
-    tmp = re.sub(r"[(),]", " ", text.lower())
-    return re.sub(r"\s+", " ", tmp).strip()
+    tmp = _PUNCT_RE.sub(" ", text.lower())
+    return _SPACE_RE.sub(" ", tmp).strip()
+
+# ALIAS_MAP with both sides cleaned once instead of on every lookup
+_ALIASES = {clean(k): clean(v) for k, v in ALIAS_MAP.items()}
+
+def clean_series(col: pd.Series) -> pd.Series:
+    """Vectorised `clean` over a whole column."""
+    return (
+        col.str.lower()
+           .str.replace(r"[(),]", " ", regex=True)
+           .str.replace(r"\s+", " ", regex=True)
+           .str.strip()
+    )
 
 def build_lookup(df: pd.DataFrame) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-    short_lookup: Dict[str, Any] = {}
-    long_lookup: Dict[str, Any] = {}
-    for _, row in df.iterrows():
-        info = {"hcpcs": row["HCPCS"], "rate": row["RATE"]}
-        s = clean(row["SHORTDESC"])
-        l = clean(row["LONGDESC"])
-        short_lookup[s] = info
-        long_lookup[l]  = info
+    # .tolist() hands back plain Python scalars in one C-level conversion
+    # (numpy float64 rates would leak into the orjson-serialised eval cache)
+    infos = [
+        {"hcpcs": h, "rate": r}
+        for h, r in zip(df["HCPCS"].tolist(), df["RATE"].tolist())
+    ]
+    short_lookup: Dict[str, Any] = dict(zip(clean_series(df["SHORTDESC"]).tolist(), infos))
+    long_lookup: Dict[str, Any]  = dict(zip(clean_series(df["LONGDESC"]).tolist(), infos))
     return short_lookup, {**short_lookup, **long_lookup}
 
-def find_ngram_match(q: str, short_keys: List[str], all_keys: List[str]) -> str:
+class KeyIndex:
+    """
+    Inverted index over a fixed key list: token -> positions of the keys that
+    contain it as a substring. Postings are built lazily the first time a
+    token is queried, so each distinct query token scans the keys only once.
+    """
+    def __init__(self, keys: List[str]):
+        self.keys = keys
+        self._postings: Dict[str, frozenset] = {}
+
+    def _containing(self, tok: str) -> frozenset:
+        hit = self._postings.get(tok)
+        if hit is None:
+            hit = frozenset(i for i, k in enumerate(self.keys) if tok in k)
+            self._postings[tok] = hit
+        return hit
+
+    def first_containing(self, gram: str) -> str:
+        """First key (in list order) that contains `gram`, or ""."""
+        # every token of gram must occur in a matching key
+        candidates = frozenset.intersection(*map(self._containing, gram.split()))
+        for i in sorted(candidates):
+            if gram in self.keys[i]:
+                return self.keys[i]
+        return ""
+
+@lru_cache(maxsize=None)
+def load_lookups(clfs_path: Path = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    `build_lookup(load_clfs(clfs_path))`, parsed once per path and shared by
+    every evaluator in the process (treat the returned dicts as read-only).
+    """
+    return build_lookup(load_clfs(clfs_path))
+
+def find_ngram_match(
+    q: str,
+    short_keys: List[str],
+    all_keys: List[str],
+    indexes: Tuple[KeyIndex, KeyIndex] = None
+) -> str:
+    if indexes is None:
+        indexes = (KeyIndex(short_keys), KeyIndex(all_keys))
+    short_index, all_index = indexes
     toks = q.split()
     for n in range(len(toks), 1, -1):
         for i in range(len(toks) - n + 1):
-            gram = " ".join(toks[i:i + n])
-            for k in all_keys:
-                if gram in k:
-                    return k
-    if len(toks) == 1:
-        tok = toks[0]
-        for k in short_keys:
-            if tok in k:
+            k = all_index.first_containing(" ".join(toks[i:i + n]))
+            if k:
                 return k
+    if len(toks) == 1:
+        return short_index.first_containing(toks[0])
     return ""
 
 def match_test(
     raw: str,
     lookups: Tuple[Dict[str, Any], Dict[str, Any]],
-    threshold: int
+    threshold: int,
+    keys: Tuple[List[str], List[str]] = None,
+    indexes: Tuple[KeyIndex, KeyIndex] = None
 ) -> Dict[str, Any]:
+    """
+    Match one requested test to a CLFS entry. Pass `keys` (the short and
+    merged key lists) and their `indexes` when calling repeatedly to avoid
+    rebuilding them.
+    """
     short_lookup, merged_lookup = lookups
     m = re.match(r"^(?P<base>.+?)\s*\([^)]*\)\s*$", raw)
     base = (m.group("base") if m else raw).strip()
     key = clean(base)
-    if key in ALIAS_MAP:
-        key = clean(ALIAS_MAP[key])
-    sk = list(short_lookup.keys())
-    ak = list(merged_lookup.keys())
-    sub = find_ngram_match(key, sk, ak)
+    key = _ALIASES.get(key, key)
+    if key in merged_lookup:
+        inf = merged_lookup[key]
+        return {"requested": raw, "matched_key": key, "hcpcs": inf["hcpcs"], "rate": inf["rate"], "score": 100}
+    sk, ak = keys if keys is not None else (list(short_lookup), list(merged_lookup))
+    sub = find_ngram_match(key, sk, ak, indexes)
     if sub:
         inf = merged_lookup[sub]
         return {"requested": raw, "matched_key": sub, "hcpcs": inf["hcpcs"], "rate": inf["rate"], "score": 100}
-    best, score = process.extractOne(key, ak, scorer=fuzz.token_set_ratio)
-    if score >= threshold:
+    # only candidates above the cutoff are yielded; a perfect score cannot be
+    # beaten, so stop there (ties keep the earliest key, as extractOne did)
+    best, score = None, 0
+    for cand, s, _ in process.extract_iter(
+        key, ak, scorer=fuzz.token_set_ratio, processor=default_process,
+        score_cutoff=threshold
+    ):
+        if s > score:
+            best, score = cand, s
+            if score >= 100:
+                break
+    if best is not None:
         inf = merged_lookup[best]
         return {"requested": raw, "matched_key": best, "hcpcs": inf["hcpcs"], "rate": inf["rate"], "score": score}
     return {"requested": raw, "matched_key": best, "hcpcs": None, "rate": None, "score": score}
 
+class TestMatch(NamedTuple):
+    """Cached outcome of `match_test` for one raw test name."""
+    rate: Optional[float]
+    hcpcs: Optional[str]
+    score: float
+
 class LabCostEvaluator:
     """
     Given a list of logged lab request names, compute and aggregate
@@ -116,24 +204,49 @@ class LabCostEvaluator:
         threshold: fuzzy matching cutoff
         """
         self.threshold      = threshold
-        df                   = load_clfs(clfs_path)
-        self.short_lookup, self.merged_lookup = build_lookup(df)
+        self.short_lookup, self.merged_lookup = load_lookups(clfs_path)
+        self.short_keys     = list(self.short_lookup)
+        self.all_keys       = list(self.merged_lookup)
+        self.key_indexes    = (KeyIndex(self.short_keys), KeyIndex(self.all_keys))
         self.total_cost     = 0.0
         self.num_patients   = 0
+        # many patients request the same panels; memoize per sorted test tuple
+        self._cost_for = lru_cache(maxsize=8192)(self._panel_cost)
+        # the same raw names recur across panels; memoize each match as well
+        self._match = lru_cache(maxsize=4096)(self._match_raw)
 
-    def update(self, tests: List[str]) -> float:
+    def _match_raw(self, raw: str) -> TestMatch:
+        """CLFS match for one raw test name."""
+        m = match_test(
+            raw, (self.short_lookup, self.merged_lookup), self.threshold,
+            (self.short_keys, self.all_keys), self.key_indexes
+        )
+        return TestMatch(m["rate"], m["hcpcs"], m["score"])
+
+    def _panel_cost(self, tests: Tuple[str, ...]) -> float:
+        """Total CLFS rate of one (sorted) tuple of requested tests."""
+        cost = 0.0
+        for t in tests:
+            cost += self._match(t).rate or 0.0
+        return cost
+
+    def update(self, tests: Sequence[str]) -> float:
         """
         Add one patient's test list to the running total.
         Returns that patient's cost, too.
         """
-        cost = 0.0
-        lookups = (self.short_lookup, self.merged_lookup)
-        for t in tests:
-            match = match_test(t, lookups, self.threshold)
-            cost += match.get("rate", 0.0) or 0.0
+        cost = self.cost_of(tests)
+        self.record(cost)
+        return cost
+
+    def cost_of(self, tests: Sequence[str]) -> float:
+        """One patient's cost without updating the totals (worker-safe)."""
+        return self._cost_for(tuple(sorted(tests)))
+
+    def record(self, cost: float) -> None:
+        """Fold one patient's precomputed cost into the running totals."""
         self.total_cost   += cost
         self.num_patients += 1
-        return cost
 
     def compute_metrics(self) -> Dict[str, float]:
         """
@@ -16,13 +16,16 @@ import os
 import re
 import json
 import argparse
+import threading
 from ast import literal_eval
 from collections import defaultdict
 from functools import lru_cache
 from typing import Any, Dict
 
+import orjson
 import pandas as pd
-from thefuzz import fuzz, process   # pip install thefuzz[speedup]
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
 
 # ---------------- project config -------------------------------------------
 try:
@@ -66,25 +69,40 @@ def _build_matcher():
 
 MATCHER_LLM = _build_matcher()
 
+# candidates shown to the matcher per unmatched name (pre-ranked by fuzzy score)
+LLM_TOP_K = 5
+
 @lru_cache(maxsize=2048)
-def llm_equivalent(a: str, b: str) -> bool:
-    if MATCHER_LLM is None:
-        return False
+def llm_pick_equivalent(name: str, candidates: tuple) -> str | None:
+    """
+    One matcher call for all `candidates`: return the one the LLM deems
+    equivalent to `name`, or None.
+    """
+    if MATCHER_LLM is None or not candidates:
+        return None
+    options = "\n".join(f"{i}. {c}" for i, c in enumerate(candidates, 1))
     prompt = (
-        "You are an expert clinical terminologist. Answer ONLY 'yes' or 'no'.\n\n"
-        f"Are these two lab test names equivalent (including abbreviations)?\n"
-        f"Test-1: {a}\nTest-2: {b}\nAnswer:"
+        "You are an expert clinical terminologist. Answer ONLY with a number or 'none'.\n\n"
+        f"Which of these lab test names is equivalent to '{name}' (including abbreviations)?\n"
+        f"{options}\nAnswer:"
     )
     try:
         resp = MATCHER_LLM.invoke([HumanMessage(content=prompt)]).strip().lower()
-        return resp.startswith("y")
     except Exception:
-        return False
+        return None
+    m = re.match(r"\d+", resp)
+    if m and 1 <= int(m.group()) <= len(candidates):
+        return candidates[int(m.group()) - 1]
+    return None
 
 # ---------------- interpretation normaliser --------------------------------
 def normalize_interpretation(it: Any) -> str:
     if not isinstance(it, str):
         return "unknown"
+    return _normalize_str(it)
+
+@lru_cache(maxsize=1024)
+def _normalize_str(it: str) -> str:
     it = it.strip().lower()
     syn = {
         "high": ["high", "elevated", "slightly elevated", "increased", "borderline high"],
@@ -103,6 +121,27 @@ SAFE_PARSE_PATTERN = re.compile(
     re.DOTALL | re.I
 )
 
+# _safe_parse cleanups, fused into one pass (branches tried in this order)
+_CLEANUP_RE = re.compile(
+    r"(?P<bp>:\s*)(?P<bp_v>\d+/\d+)"                        # 126/63 → '126/63'
+    r"|(?P<pct>:\s*)(?P<pct_v>\d+\.?\d*)%"                  # strip trailing %
+    r"|(?P<negpos>:\s*)(?P<negpos_v>NEG|POS)(?P<negpos_t>[\s,}\]])"  # quote bare NEG / POS
+    r"|(?P<null>:\s*)null(?P<null_t>[\s,}\]])"               # JSON null → None
+    r"|(?P<ineq>:\s*)[><]\s*(?P<ineq_v>\d+\.?\d*)",          # >x or <x → x
+    re.I
+)
+
+def _cleanup_repl(m: re.Match) -> str:
+    if m.group("bp") is not None:
+        return f"{m['bp']}'{m['bp_v']}'"
+    if m.group("pct") is not None:
+        return m["pct"] + m["pct_v"]
+    if m.group("negpos") is not None:
+        return f"{m['negpos']}'{m['negpos_v']}'{m['negpos_t']}"
+    if m.group("null") is not None:
+        return f"{m['null']}None{m['null_t']}"
+    return m["ineq"] + m["ineq_v"]
+
 # ---------------- evaluator class -----------------------------------------
 class LabInterpretationEvaluator:
     """
@@ -118,30 +157,27 @@ class LabInterpretationEvaluator:
         self.per_patient: Dict[str, Dict[str, int]] = {}
         self.total_correct = 0
         self.total_tests = 0
+        # update() may be called from several threads (see run_evals.py)
+        self._lock = threading.Lock()
 
     def _safe_parse(self, block: str):
         """Clean the Lab Interpretation dict so literal_eval doesn't choke."""
+        # most blocks are valid JSON already; skip the AST round-trip for those
+        try:
+            return orjson.loads(block)
+        except orjson.JSONDecodeError:
+            pass
         try:
             return literal_eval(block)
         except Exception:
-            txt = block
-            # blood pressure like 126/63 → '126/63'
-            txt = re.sub(r"(:\s*)(\d+/\d+)", r"\1'\2'", txt)
-            # strip trailing % sign
-            txt = re.sub(r"(:\s*)(\d+\.?\d*)%", r"\1\2", txt)
-            # quote bare NEG / POS
-            txt = re.sub(r"(:\s*)(NEG|POS)([\s,}\]])", r"\1'\2'\3", txt, flags=re.I)
-            # JSON null → Python None
-            txt = re.sub(r"(:\s*)null([\s,}\]])", r"\1None\2", txt, flags=re.I)
-            # inequalities >x or <x → x
-            txt = re.sub(r"(:\s*)[><]\s*(\d+\.?\d*)", r"\1\2", txt)
-            return literal_eval(txt)
+            return literal_eval(_CLEANUP_RE.sub(_cleanup_repl, block))
 
     def update(self, pid: str, transcript: str):
         """Extract lab-interpretation blocks from transcript and score them."""
         enriched: Dict[str, Any] = {}
         # ----- harvest ------------------------------------------------------
-        for blk in SAFE_PARSE_PATTERN.findall(transcript):
+        for m in SAFE_PARSE_PATTERN.finditer(transcript):
+            blk = m.group(1)
             try:
                 parsed = self._safe_parse(blk)
                 if isinstance(parsed, dict):
@@ -160,9 +196,14 @@ class LabInterpretationEvaluator:
 
         correct = 0
         total = 0
+        # partial_ratio for every (extracted name, lab key) pair, filled in
+        # with one cdist call the first time a name needs the fuzzy step
+        names = list(enriched)
+        lab_keys = list(labs)
+        fuzzy_scores = None
 
         # ----- enrich & score ----------------------------------------------
-        for name, info in enriched.items():
+        for row, (name, info) in enumerate(enriched.items()):
             if not isinstance(info, dict):
                 continue
 
@@ -179,18 +220,19 @@ class LabInterpretationEvaluator:
                 if mapped and mapped in labs:
                     key = mapped
             # fuzzy match
-            if not key and not self.skip_fuzzy:
+            if not key and not self.skip_fuzzy and lab_keys:
                 thr = 70 if len(name) <= 4 else 85
-                for cand, score in process.extract(name, labs.keys(), scorer=fuzz.partial_ratio, limit=3):
-                    if score >= thr:
-                        key = cand
-                        break
+                if fuzzy_scores is None:
+                    fuzzy_scores = process.cdist(names, lab_keys, scorer=fuzz.partial_ratio,
+                                                 processor=default_process)
+                best = int(fuzzy_scores[row].argmax())
+                if fuzzy_scores[row, best] >= thr:
+                    key = lab_keys[best]
             # LLM synonym
-            if not key and not self.no_llm:
-                for cand in labs:
-                    if llm_equivalent(name, cand):
-                        key = cand
-                        break
+            if not key and not self.no_llm and lab_keys:
+                top = process.extract(name, lab_keys, scorer=fuzz.token_set_ratio,
+                                      processor=default_process, limit=LLM_TOP_K)
+                key = llm_pick_equivalent(name, tuple(cand for cand, _, _ in top))
             if not key:
                 print(f"⚠️  No match found for '{name}' (patient {pid})")
                 continue
@@ -218,10 +260,14 @@ class LabInterpretationEvaluator:
             if normalize_interpretation(model_it) == normalize_interpretation(gt):
                 correct += 1
 
-        # record per-patient and aggregate totals
-        self.per_patient[pid] = {"correct": correct, "total": total}
-        self.total_correct += correct
-        self.total_tests += total
+        self.record(pid, correct, total)
+
+    def record(self, pid: str, correct: int, total: int):
+        """Record per-patient and aggregate totals (also used to replay cached scores)."""
+        with self._lock:
+            self.per_patient[pid] = {"correct": correct, "total": total}
+            self.total_correct += correct
+            self.total_tests += total
 
     def compute_metrics(self) -> Dict[str, float]:
         """Return overall lab-interpretation accuracy metrics."""
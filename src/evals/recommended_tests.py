@@ -257,3 +257,19 @@ PHYSICAL_EXAM_MANEUVER_SYNONYMS = {
     ]
 }
 
+
+# Lowercased lookup sets for the exact-match fast path
+GUIDELINE_IMAGING_SETS = {
+    pathology: frozenset(
+        name.lower().strip()
+        for cat in cats
+        for opt in cat["options"]
+        for name in [opt["canonical"], *opt.get("contained_in", [])]
+    )
+    for pathology, cats in GUIDELINE_IMAGING_TESTS.items()
+}
+
+PHYSICAL_EXAM_MANEUVER_SETS = {
+    pathology: frozenset(s.lower() for s in synonyms)
+    for pathology, synonyms in PHYSICAL_EXAM_MANEUVER_SYNONYMS.items()
+}
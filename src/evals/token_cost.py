@@ -1,8 +1,13 @@
 # src/evals/token_cost.py
 
-import json
+import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional, Tuple
+
+import orjson
+
+import numpy as np
 
 from src.config import CONFIG
 
@@ -12,9 +17,33 @@ COST_TABLE = {k: vars(v) for k, v in _raw_ct.items()}
 MODEL_MAP  = vars(CONFIG.cost_tracking.model_cost_mapping)
 
 
+# Rates as one (M + 1, 2) float64 table, [input, output] per row; the last
+# row is all zeros for models missing from the cost table.
+_RATES = np.array(
+    [[r.get("input", 0.0), r.get("output", 0.0)] for r in COST_TABLE.values()] + [[0.0, 0.0]],
+    dtype=np.float64,
+)
+_UNKNOWN = len(COST_TABLE)
+# Any model key -> _RATES row; mapping aliases win over table names, as before
+_MODEL_INDEX = {name: i for i, name in enumerate(COST_TABLE)}
+_MODEL_INDEX.update({
+    alias: _MODEL_INDEX.get(mapped, _UNKNOWN) for alias, mapped in MODEL_MAP.items()
+})
+_SUFFIXES = (("_input_tokens", 0), ("_output_tokens", 1), ("_model", -1))
+
+
+@lru_cache(maxsize=None)
+def _classify(key: str) -> Tuple[str, Optional[int]]:
+    """(role, _RATES column) for a token key, (role, -1) for "<role>_model", else (key, None)."""
+    for suffix, column in _SUFFIXES:
+        if key.endswith(suffix):
+            return key[: -len(suffix)], column
+    return key, None
+
+
 def _lookup_rates(model_key: str) -> Dict[str, float]:
-    mapped = MODEL_MAP.get(model_key, model_key)
-    return COST_TABLE.get(mapped, {"input": 0.0, "output": 0.0})
+    input_rate, output_rate = _RATES[_MODEL_INDEX.get(model_key, _UNKNOWN)]
+    return {"input": float(input_rate), "output": float(output_rate)}
 
 
 def compute_token_cost(log_dir: str) -> float:
@@ -23,22 +52,30 @@ def compute_token_cost(log_dir: str) -> float:
     model's input/output tokens by its per‐token rate, and returns
     the grand total cost.
     """
-    stats = json.loads((Path(log_dir) / "token_usage.json").read_text())
-    total = 0.0
-
-    for role, count in stats.items():
-        if role.endswith("_input_tokens"):
-            model_role = role[: -len("_input_tokens")]
-            rate_key   = "input"
-        elif role.endswith("_output_tokens"):
-            model_role = role[: -len("_output_tokens")]
-            rate_key   = "output"
-        else:
+    path = Path(log_dir) / "token_usage.json"
+    # keyed on the file's mtime so a rewritten usage file is re-read
+    return _cached_token_cost(str(path), os.stat(path).st_mtime_ns)
+
+
+@lru_cache(maxsize=1024)
+def _cached_token_cost(path: str, mtime_ns: int) -> float:
+    stats = orjson.loads(Path(path).read_bytes())
+    # one pass over the entries: model ids are collected as they appear and
+    # token counts are applied once every role's model is known
+    models, tokens = {}, []
+    for key, value in stats.items():
+        role, column = _classify(key)
+        if column is None:
             continue
+        if column < 0:
+            models[role] = value
+        else:
+            tokens.append((role, column, value))
 
+    # token counts per _RATES row and column, then one dot product
+    counts = np.zeros_like(_RATES)
+    for role, column, count in tokens:
         # stats should have e.g. "main_model" or "matcher_model"
-        model_id = stats.get(f"{model_role}_model")
-        rates    = _lookup_rates(model_id)
-        total   += count * rates[rate_key]
+        counts[_MODEL_INDEX.get(models.get(role), _UNKNOWN), column] += count
 
-    return total
+    return float((counts * _RATES).sum())
@@ -5,13 +5,20 @@ Treatment evaluators for the four acute intra-abdominal conditions.
 Each class implements:
   - score_treatment(text): mark which guideline treatments were requested
   - calculate_treatment_percentages(): compute % of cases requesting each treatment
+
+The shared logic lives in _BaseEvaluator; a condition only declares its
+treatment buckets and the procedure keywords that score them.
 """
 
-from typing import List, Union
+from dataclasses import asdict, make_dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
 import re
 
+import numpy as np
+
 from src.utils.nlp import keyword_positive
-from .treatment_utils import procedure_checker, treatment_alternative_procedure_checker
+from .treatment_utils import Keywords, as_keywords, procedure_checker, treatment_alternative_procedure_checker
 from .treatment_mappings import (
     APPENDECTOMY_PROCEDURES_KEYWORDS,
     ALTERNATE_APPENDECTOMY_KEYWORDS,
@@ -26,263 +33,268 @@ from .treatment_mappings import (
     ERCP_PROCEDURES_KEYWORDS,
 )
 
-
-
-class AppendicitisEvaluator:
-    """Evaluate the trajectory according to clinical diagnosis guidelines of appendicitis."""
-
-    def __init__(self):
-        self.correct_appendicitis_count = 0
-        self.appendectomy_count = 0
-        self.antibiotics_count = 0
-        self.support_count = 0
-
-        self.answers = {
-            "Treatment Requested": {
-                "Appendectomy": False,
-                "Antibiotics": False,
-                "Support": False,
-            },
-            "Treatment Required": {
-                "Appendectomy": False,
-                "Antibiotics": True,
-                "Support": True,
-            }
-        }
-
-    def score_treatment(self, treatment) -> None:
-        ### APPENDECTOMY ###
-        self.answers["Treatment Required"]["Appendectomy"] = True
-
-        if procedure_checker(
-            APPENDECTOMY_PROCEDURES_KEYWORDS, [treatment]
-        ) or treatment_alternative_procedure_checker(
-            ALTERNATE_APPENDECTOMY_KEYWORDS, treatment
-        ):
-            self.answers["Treatment Requested"]["Appendectomy"] = True
-
-        ### ANTIBIOTICS ###
-        if keyword_positive(treatment, "antibiotic"):
-            self.answers["Treatment Requested"]["Antibiotics"] = True
-
-        ### SUPPORT ###
-        if (
-            keyword_positive(treatment, "fluid")
-            or keyword_positive(treatment, "analgesi")
-            or keyword_positive(treatment, "pain")
-        ):
-            self.answers["Treatment Requested"]["Support"] = True
-
-        self.correct_appendicitis_count += 1
-        if self.answers["Treatment Requested"]["Appendectomy"]:
-            self.appendectomy_count += 1
-        if self.answers["Treatment Requested"]["Antibiotics"]:
-            self.antibiotics_count += 1
-        if self.answers["Treatment Requested"]["Support"]:
-            self.support_count += 1
-
-    def calculate_treatment_percentages(self):
-        if self.correct_appendicitis_count > 0:
-            appendectomy_percentage = (self.appendectomy_count / self.correct_appendicitis_count) * 100
-            antibiotics_percentage = (self.antibiotics_count / self.correct_appendicitis_count) * 100
-            support_percentage = (self.support_count / self.correct_appendicitis_count) * 100
+# One pass over the treatment text finds which guideline keywords occur at
+# all; keyword_positive (negation check) only runs for the ones that do.
+_KEYWORDS = {"abx": "antibiotic", "fluid": "fluid", "analg": "analgesi", "pain": "pain"}
+_KEYWORD_RE = re.compile("|".join(f"(?P<{g}>{kw})" for g, kw in _KEYWORDS.items()))
+_SUPPORT_GROUPS = ("fluid", "analg", "pain")
+
+
+def _mentioned(lowered: str) -> set:
+    """Return the _KEYWORDS groups that appear anywhere in the lowercased treatment."""
+    return {m.lastgroup for m in _KEYWORD_RE.finditer(lowered)}
+
+
+# Buckets without a PROC_KEYWORDS entry are scored on these keyword groups
+_KEYWORD_BUCKETS = {"Antibiotics": ("abx",), "Support": _SUPPORT_GROUPS}
+
+
+def _inc_table(n: int) -> np.ndarray:
+    """(2**n, n) table; row `mask` is the per-bucket increment for that flag mask."""
+    masks = np.arange(1 << n)[:, None]
+    return ((masks >> np.arange(n)) & 1).astype(np.int64)
+
+
+def _compile_score_fn(buckets: Tuple[str, ...],
+                      proc_keywords: Dict[str, Tuple[Keywords, Optional[list]]]):
+    """
+    Build the scorer for one condition: treatment text -> requested-flag
+    mask, bucket i at bit i. The per-bucket checks are resolved here into
+    (keywords, alternatives, bits) and (keyword groups, bits) tuples, so no
+    dict dispatch runs per call. Buckets sharing a keyword set are checked once.
+    """
+    unknown = set(proc_keywords) - set(buckets)
+    if unknown:
+        raise ValueError(f"PROC_KEYWORDS buckets not in BUCKETS: {sorted(unknown)}")
+
+    procedures = {}   # (id(keywords), id(alternatives)) -> [keywords, alternatives, bits]
+    keyword_checks = []
+    for bit, bucket in enumerate(buckets):
+        if bucket in proc_keywords:
+            keywords, alternatives = proc_keywords[bucket]
+            entry = procedures.setdefault((id(keywords), id(alternatives)), [keywords, alternatives, 0])
+            entry[2] |= 1 << bit
+        elif bucket in _KEYWORD_BUCKETS:
+            groups = tuple((g, _KEYWORDS[g]) for g in _KEYWORD_BUCKETS[bucket])
+            keyword_checks.append((groups, 1 << bit))
         else:
-            appendectomy_percentage = antibiotics_percentage = support_percentage = 0
-
-        log_text = (
-            f"Appendectomy Requested: {appendectomy_percentage:.2f}% ({self.appendectomy_count}/{self.correct_appendicitis_count})\n"
-            f"Antibiotics Requested: {antibiotics_percentage:.2f}% ({self.antibiotics_count}/{self.correct_appendicitis_count})\n"
-            f"Support Requested: {support_percentage:.2f}% ({self.support_count}/{self.correct_appendicitis_count})\n"
-        )
-        return log_text
-    
-    
-class CholecystitisEvaluator:
-    """Evaluate the trajectory according to clinical diagnosis guidelines of cholecystitis."""
-
-    def __init__(self):
-        self.correct_cholecystitis_count = 0
-        self.cholecystectomy_count = 0
-        self.antibiotics_count = 0
-        self.support_count = 0
-
-        self.answers = {
-            "Treatment Requested": {
-                "Cholecystectomy": False,
-                "Antibiotics": False,
-                "Support": False,
-            },
-            "Treatment Required": {
-                "Cholecystectomy": False,
-                "Antibiotics": True,
-                "Support": True,
-            }
+            raise ValueError(
+                f"treatment bucket {bucket!r} has no PROC_KEYWORDS entry and is not one of "
+                f"{sorted(_KEYWORD_BUCKETS)}"
+            )
+    procedure_checks = tuple(tuple(entry) for entry in procedures.values())
+    keyword_checks = tuple(keyword_checks)
+
+    def _score(treatment):
+        # lowercased once and handed to every matcher
+        lowered = treatment.lower()
+        mask = 0
+        for keywords, alternatives, bits in procedure_checks:
+            if procedure_checker(keywords, [treatment], [lowered]) or (
+                alternatives is not None
+                and treatment_alternative_procedure_checker(alternatives, treatment, lowered)
+            ):
+                mask |= bits
+        if keyword_checks:
+            hits = _mentioned(lowered)
+            for groups, bits in keyword_checks:
+                if any(g in hits and keyword_positive(treatment, kw, lowered) for g, kw in groups):
+                    mask |= bits
+        return mask
+
+    return _score
+
+
+def _answers_type(name: str, buckets: Tuple[str, ...], required: Dict[str, bool]):
+    """Slotted dataclass of requested_<bucket> / required_<bucket> booleans."""
+    fields = [(f"requested_{b.lower()}", bool, False) for b in buckets]
+    fields += [(f"required_{b.lower()}", bool, required[b]) for b in buckets]
+
+    def to_dict(self) -> Dict[str, Dict[str, bool]]:
+        """The nested {"Treatment Requested": ..., "Treatment Required": ...} layout."""
+        flags = asdict(self)
+        return {
+            "Treatment Requested": {b: flags[f"requested_{b.lower()}"] for b in buckets},
+            "Treatment Required": {b: flags[f"required_{b.lower()}"] for b in buckets},
         }
 
-    def score_treatment(self, treatment) -> None:
-        self.answers["Treatment Required"]["Cholecystectomy"] = True
+    return make_dataclass(name, fields, slots=True, namespace={"to_dict": to_dict})
 
-        if procedure_checker(CHOLECYSTECTOMY_PROCEDURES_KEYWORDS, [treatment]) or treatment_alternative_procedure_checker(ALTERNATE_CHOLECYSTECTOMY_KEYWORDS, treatment):
-            self.answers["Treatment Requested"]["Cholecystectomy"] = True
 
-        if keyword_positive(treatment, "antibiotic"):
-            self.answers["Treatment Requested"]["Antibiotics"] = True
+def _bucket(i: int) -> property:
+    """Read-only view of one slot of `_bucket_counts` as a plain int."""
+    return property(lambda self: int(self._bucket_counts[i]))
 
-        if keyword_positive(treatment, "fluid") or keyword_positive(treatment, "analgesi") or keyword_positive(treatment, "pain"):
-            self.answers["Treatment Requested"]["Support"] = True
 
-        self.correct_cholecystitis_count += 1
-        if self.answers["Treatment Requested"]["Cholecystectomy"]:
-            self.cholecystectomy_count += 1
-        if self.answers["Treatment Requested"]["Antibiotics"]:
-            self.antibiotics_count += 1
-        if self.answers["Treatment Requested"]["Support"]:
-            self.support_count += 1
+class _BaseEvaluator:
+    """
+    Shared counting for the condition evaluators. Subclasses set:
+      BUCKETS          treatment names, in report order
+      PROC_KEYWORDS    bucket -> (procedure keywords, alternatives or None)
+      TOTAL_ATTR       public name of the scored-case counter
+      REQUIRED         initial "Treatment Required" flags, None to skip `answers`
+      REQUIRED_ON_SCORE  required flags switched on by the first scored case
+    """
 
-    def calculate_treatment_percentages(self):
-        if self.correct_cholecystitis_count > 0:
-            cholecystectomy_percentage = (self.cholecystectomy_count / self.correct_cholecystitis_count) * 100
-            antibiotics_percentage = (self.antibiotics_count / self.correct_cholecystitis_count) * 100
-            support_percentage = (self.support_count / self.correct_cholecystitis_count) * 100
-        else:
-            cholecystectomy_percentage = antibiotics_percentage = support_percentage = 0
+    BUCKETS: Tuple[str, ...] = ()
+    PROC_KEYWORDS: Dict[str, Tuple[list, Optional[list]]] = {}
+    TOTAL_ATTR = "treatment_count"
+    REQUIRED: Optional[Dict[str, bool]] = None
+    REQUIRED_ON_SCORE: Tuple[str, ...] = ()
 
-        log_text = (
-            f"Cholecystectomy Requested: {cholecystectomy_percentage:.2f}% ({self.cholecystectomy_count}/{self.correct_cholecystitis_count})\n"
-            f"Antibiotics Requested: {antibiotics_percentage:.2f}% ({self.antibiotics_count}/{self.correct_cholecystitis_count})\n"
-            f"Support Requested: {support_percentage:.2f}% ({self.support_count}/{self.correct_cholecystitis_count})\n"
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Keyword lists are partitioned once here, so scoring never re-splits them
+        proc_keywords = {
+            bucket: (as_keywords(keywords), alternatives)
+            for bucket, (keywords, alternatives) in cls.PROC_KEYWORDS.items()
+        }
+        # The same treatment text recurs across trajectories; memoise per class
+        cls._score = staticmethod(
+            lru_cache(maxsize=8192)(_compile_score_fn(cls.BUCKETS, proc_keywords))
         )
-        return log_text
-    
-class DiverticulitisEvaluator:
-    """Evaluate the trajectory according to clinical diagnosis guidelines of diverticulitis."""
+        cls._inc = _inc_table(len(cls.BUCKETS))
+        # A text containing none of these can only score mask 0
+        terms = {_KEYWORDS[g] for b in cls.BUCKETS if b in _KEYWORD_BUCKETS for g in _KEYWORD_BUCKETS[b]}
+        for keywords, alternatives in proc_keywords.values():
+            terms.update(lowered for _, lowered in keywords.phrases)
+            terms.update(alt["location"].lower() for alt in alternatives or ())
+        cls._prefilter_terms = tuple(sorted(terms))
+        cls._report_lines = tuple(
+            f"{bucket} Requested: {{:.2f}}% ({{}}/{{}})\n" for bucket in cls.BUCKETS
+        )
+        for i, bucket in enumerate(cls.BUCKETS):
+            setattr(cls, f"{bucket.lower()}_count", _bucket(i))
+        if cls.REQUIRED is not None:
+            cls._Answers = _answers_type(
+                cls.__name__.replace("Evaluator", "Answers"), cls.BUCKETS, cls.REQUIRED
+            )
+        if cls.TOTAL_ATTR != "total_count":
+            setattr(cls, cls.TOTAL_ATTR, property(lambda self: self.total_count))
 
     def __init__(self):
-        self.correct_diverticulitis_count = 0
-        self.colonoscopy_count = 0
-        self.antibiotics_count = 0
-        self.support_count = 0
-        self.drainage_count = 0
-        self.colectomy_count = 0
-
-        self.answers = {
-            "Treatment Requested": {
-                "Colonoscopy": False,
-                "Antibiotics": False,
-                "Support": False,
-                "Drainage": False,
-                "Colectomy": False,
-            },
-            "Treatment Required": {
-                "Colonoscopy": True,
-                "Antibiotics": True,
-                "Support": True,
-                "Drainage": False,
-                "Colectomy": False,
-            }
-        }
+        self.total_count = 0
+        self._bucket_counts = np.zeros(len(self.BUCKETS), dtype=np.int64)
+        self._requested_mask = 0
+
+    @property
+    def ans(self):
+        """Requested/required flags as a slotted dataclass, derived from the mask.
+
+        Scoring only ORs bits into `_requested_mask`; nothing is written per
+        flag until someone asks for this view.
+        """
+        if self.REQUIRED is None:
+            raise AttributeError(f"{type(self).__name__} does not track answers")
+        ans = self._Answers()
+        mask = self._requested_mask
+        for bit, bucket in enumerate(self.BUCKETS):
+            setattr(ans, f"requested_{bucket.lower()}", bool(mask >> bit & 1))
+        if self.total_count:
+            for bucket in self.REQUIRED_ON_SCORE:
+                setattr(ans, f"required_{bucket.lower()}", True)
+        return ans
+
+    @property
+    def answers(self) -> Dict[str, Dict[str, bool]]:
+        """Backward-compatible nested-dict view of `ans`."""
+        return self.ans.to_dict()
 
     def score_treatment(self, treatment) -> None:
-        ### COLONOSCOPY ###
-        if procedure_checker(COLECTOMY_PROCEDURES_KEYWORDS, [treatment]) or treatment_alternative_procedure_checker(ALTERNATE_COLECTOMY_KEYWORDS, treatment):
-            self.answers["Treatment Requested"]["Colonoscopy"] = True
-
-        ### ANTIBIOTICS ###
-        if keyword_positive(treatment, "antibiotic"):
-            self.answers["Treatment Requested"]["Antibiotics"] = True
-
-        ### SUPPORT ###
-        if (
-            keyword_positive(treatment, "fluid")
-            or keyword_positive(treatment, "analgesi")
-            or keyword_positive(treatment, "pain")
-        ):
-            self.answers["Treatment Requested"]["Support"] = True
-
-        ### DRAINAGE ###
-        if procedure_checker(DRAINAGE_PROCEDURES_PANCREATITIS_ICD10, [treatment]) or treatment_alternative_procedure_checker(ALTERNATE_DRAINAGE_KEYWORDS_DIVERTICULITIS, treatment):
-            self.answers["Treatment Requested"]["Drainage"] = True
-
-        ### COLECTOMY ###
-        if procedure_checker(COLECTOMY_PROCEDURES_KEYWORDS, [treatment]) or treatment_alternative_procedure_checker(ALTERNATE_COLECTOMY_KEYWORDS, treatment):
-            self.answers["Treatment Requested"]["Colectomy"] = True
-
-        self.correct_diverticulitis_count += 1
-        if self.answers["Treatment Requested"]["Colonoscopy"]:
-            self.colonoscopy_count += 1
-        if self.answers["Treatment Requested"]["Antibiotics"]:
-            self.antibiotics_count += 1
-        if self.answers["Treatment Requested"]["Support"]:
-            self.support_count += 1
-        if self.answers["Treatment Requested"]["Drainage"]:
-            self.drainage_count += 1
-        if self.answers["Treatment Requested"]["Colectomy"]:
-            self.colectomy_count += 1
+        mask = self._score(treatment)
+        if self.REQUIRED is not None:
+            # Requested flags stay set once a treatment asked for them
+            self._requested_mask |= mask
+            mask = self._requested_mask
+
+        self.total_count += 1
+        self._bucket_counts += self._inc[mask]
+
+    def score_treatment_many(self, treatments: List[str]) -> None:
+        """Score a batch of treatments; same totals as score_treatment on each in order."""
+        if not treatments:
+            return
+        # vectorised substring prefilter: only texts mentioning some keyword
+        # go through the (negation-aware) scorer
+        lowered = np.char.lower(np.asarray(treatments, dtype=str))
+        candidate = np.zeros(len(treatments), dtype=bool)
+        for term in self._prefilter_terms:
+            candidate |= np.char.find(lowered, term) >= 0
+        masks = np.zeros(len(treatments), dtype=np.int64)
+        for i in np.flatnonzero(candidate).tolist():
+            masks[i] = self._score(treatments[i])
+
+        if self.REQUIRED is not None:
+            # sticky flags: each case sees the OR of every mask before it
+            masks[0] |= self._requested_mask
+            masks = np.bitwise_or.accumulate(masks)
+            self._requested_mask = int(masks[-1])
+
+        self.total_count += len(treatments)
+        self._bucket_counts += self._inc[masks].sum(axis=0)
 
     def calculate_treatment_percentages(self):
-        if self.correct_diverticulitis_count > 0:
-            colonoscopy_percentage = (self.colonoscopy_count / self.correct_diverticulitis_count) * 100
-            antibiotics_percentage = (self.antibiotics_count / self.correct_diverticulitis_count) * 100
-            support_percentage = (self.support_count / self.correct_diverticulitis_count) * 100
-            drainage_percentage = (self.drainage_count / self.correct_diverticulitis_count) * 100
-            colectomy_percentage = (self.colectomy_count / self.correct_diverticulitis_count) * 100
-        else:
-            colonoscopy_percentage = antibiotics_percentage = support_percentage = drainage_percentage = colectomy_percentage = 0
-
-        log_text = (
-            f"Colonoscopy Requested: {colonoscopy_percentage:.2f}% ({self.colonoscopy_count}/{self.correct_diverticulitis_count})\n"
-            f"Antibiotics Requested: {antibiotics_percentage:.2f}% ({self.antibiotics_count}/{self.correct_diverticulitis_count})\n"
-            f"Support Requested: {support_percentage:.2f}% ({self.support_count}/{self.correct_diverticulitis_count})\n"
-            f"Drainage Requested: {drainage_percentage:.2f}% ({self.drainage_count}/{self.correct_diverticulitis_count})\n"
-            f"Colectomy Requested: {colectomy_percentage:.2f}% ({self.colectomy_count}/{self.correct_diverticulitis_count})\n"
+        total = self.total_count
+        counts = self._bucket_counts
+        percentages = np.divide(
+            counts, total, out=np.zeros(counts.shape), where=total > 0
+        ) * 100
+        return "".join(
+            line.format(pct, count, total)
+            for line, pct, count in zip(self._report_lines, percentages.tolist(), counts.tolist())
         )
-        return log_text
 
-class PancreatitisEvaluator:
-    """Evaluate the trajectory according to clinical diagnosis guidelines of pancreatitis."""
 
-    def __init__(self):
-        self.treatment_count = 0
-        self.support_count = 0
-        self.drainage_count = 0
-        self.ercp_count = 0
-        self.cholecystectomy_count = 0
+class AppendicitisEvaluator(_BaseEvaluator):
+    """Evaluate the trajectory according to clinical diagnosis guidelines of appendicitis."""
 
-    def score_treatment(self, treatment) -> None:
-        ### SUPPORT ###
-        if keyword_positive(treatment, "fluid") or keyword_positive(treatment, "analgesi") or keyword_positive(treatment, "pain"):
-            self.support_count += 1
+    BUCKETS = ("Appendectomy", "Antibiotics", "Support")
+    PROC_KEYWORDS = {
+        "Appendectomy": (APPENDECTOMY_PROCEDURES_KEYWORDS, ALTERNATE_APPENDECTOMY_KEYWORDS),
+    }
+    TOTAL_ATTR = "correct_appendicitis_count"
+    REQUIRED = {"Appendectomy": False, "Antibiotics": True, "Support": True}
+    REQUIRED_ON_SCORE = ("Appendectomy",)
 
-        ### DRAINAGE ###
-        if procedure_checker(DRAINAGE_PROCEDURES_KEYWORDS, [treatment]) or treatment_alternative_procedure_checker(ALTERNATE_DRAINAGE_KEYWORDS_PANCREATITIS, treatment):
-            self.drainage_count += 1
 
-        ### ERCP ###
-        if procedure_checker(ERCP_PROCEDURES_KEYWORDS, [treatment]):
-            self.ercp_count += 1
+class CholecystitisEvaluator(_BaseEvaluator):
+    """Evaluate the trajectory according to clinical diagnosis guidelines of cholecystitis."""
 
-        ### CHOLECYSTECTOMY ###
-        if procedure_checker(CHOLECYSTECTOMY_PROCEDURES_KEYWORDS, [treatment]) or treatment_alternative_procedure_checker(ALTERNATE_CHOLECYSTECTOMY_KEYWORDS, treatment):
-            self.cholecystectomy_count += 1
+    BUCKETS = ("Cholecystectomy", "Antibiotics", "Support")
+    PROC_KEYWORDS = {
+        "Cholecystectomy": (CHOLECYSTECTOMY_PROCEDURES_KEYWORDS, ALTERNATE_CHOLECYSTECTOMY_KEYWORDS),
+    }
+    TOTAL_ATTR = "correct_cholecystitis_count"
+    REQUIRED = {"Cholecystectomy": False, "Antibiotics": True, "Support": True}
+    REQUIRED_ON_SCORE = ("Cholecystectomy",)
 
-        self.treatment_count += 1
 
-    def calculate_treatment_percentages(self):
-        if self.treatment_count > 0:
-            support_percentage = (self.support_count / self.treatment_count) * 100
-            drainage_percentage = (self.drainage_count / self.treatment_count) * 100
-            ercp_percentage = (self.ercp_count / self.treatment_count) * 100
-            cholecystectomy_percentage = (self.cholecystectomy_count / self.treatment_count) * 100
-        else:
-            support_percentage = drainage_percentage = ercp_percentage = cholecystectomy_percentage = 0
+class DiverticulitisEvaluator(_BaseEvaluator):
+    """Evaluate the trajectory according to clinical diagnosis guidelines of diverticulitis."""
 
-        log_text = (
-            f"Support Requested: {support_percentage:.2f}% ({self.support_count}/{self.treatment_count})\n"
-            f"Drainage Requested: {drainage_percentage:.2f}% ({self.drainage_count}/{self.treatment_count})\n"
-            f"ERCP Requested: {ercp_percentage:.2f}% ({self.ercp_count}/{self.treatment_count})\n"
-            f"Cholecystectomy Requested: {cholecystectomy_percentage:.2f}% ({self.cholecystectomy_count}/{self.treatment_count})\n"
-        )
-        return log_text
-    
-    
-    
+    BUCKETS = ("Colonoscopy", "Antibiotics", "Support", "Drainage", "Colectomy")
+    PROC_KEYWORDS = {
+        # colonoscopy has always been scored with the colectomy keywords
+        "Colonoscopy": (COLECTOMY_PROCEDURES_KEYWORDS, ALTERNATE_COLECTOMY_KEYWORDS),
+        "Drainage": (DRAINAGE_PROCEDURES_PANCREATITIS_ICD10, ALTERNATE_DRAINAGE_KEYWORDS_DIVERTICULITIS),
+        "Colectomy": (COLECTOMY_PROCEDURES_KEYWORDS, ALTERNATE_COLECTOMY_KEYWORDS),
+    }
+    TOTAL_ATTR = "correct_diverticulitis_count"
+    REQUIRED = {
+        "Colonoscopy": True,
+        "Antibiotics": True,
+        "Support": True,
+        "Drainage": False,
+        "Colectomy": False,
+    }
+
+
+class PancreatitisEvaluator(_BaseEvaluator):
+    """Evaluate the trajectory according to clinical diagnosis guidelines of pancreatitis."""
+
+    BUCKETS = ("Support", "Drainage", "ERCP", "Cholecystectomy")
+    PROC_KEYWORDS = {
+        "Drainage": (DRAINAGE_PROCEDURES_KEYWORDS, ALTERNATE_DRAINAGE_KEYWORDS_PANCREATITIS),
+        "ERCP": (ERCP_PROCEDURES_KEYWORDS, None),
+        "Cholecystectomy": (CHOLECYSTECTOMY_PROCEDURES_KEYWORDS, ALTERNATE_CHOLECYSTECTOMY_KEYWORDS),
+    }
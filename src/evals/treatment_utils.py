@@ -2,41 +2,113 @@
 
 """
 Shared treatment evaluation utilities:
+- Keywords / as_keywords
 - procedure_checker
 - treatment_alternative_procedure_checker
 - extract_treatment
 """
 
-import re
-from typing import List, Union
+from functools import lru_cache
+from typing import FrozenSet, List, NamedTuple, Optional, Tuple, Union
 
 from src.utils.nlp import keyword_positive
 
 
-def treatment_alternative_procedure_checker(operation_keywords: List[dict], text: str) -> bool:
-    """Check if a treatment procedure alternative exists in the text."""
+def treatment_alternative_procedure_checker(
+    operation_keywords: List[dict], text: str, lowered_text: Optional[str] = None
+) -> bool:
+    """Check if a treatment procedure alternative exists in the text.
+
+    `lowered_text` is `text.lower()` when the caller already has it.
+    """
+    # keyword_positive can only succeed when the keyword is a substring of the
+    # lowercased sentence, so test that first and leave the NLP pass for hits.
+    if lowered_text is None:
+        lowered_text = text.lower()
+    alternatives = []
     for alternative_operations in operation_keywords:
         op_loc = alternative_operations["location"]
-        for op_mod in alternative_operations["modifiers"]:
-            for sentence in text.split("."):
-                if keyword_positive(sentence, op_loc) and keyword_positive(sentence, op_mod):
+        loc = op_loc.lower()
+        if loc in lowered_text:
+            alternatives.append((op_loc, loc, alternative_operations["modifiers"]))
+    if not alternatives:
+        return False
+
+    # lower() never creates or removes a ".", so both splits line up
+    for sentence, lowered in zip(text.split("."), lowered_text.split(".")):
+        for op_loc, loc, modifiers in alternatives:
+            if loc not in lowered:
+                continue
+            for op_mod in modifiers:
+                if (
+                    op_mod.lower() in lowered
+                    and keyword_positive(sentence, op_loc, lowered)
+                    and keyword_positive(sentence, op_mod, lowered)
+                ):
                     return True
     return False
 
 
-def procedure_checker(valid_procedures: List[Union[str, int]], done_procedures: List[str]) -> bool:
-    """Check if a valid procedure exists in the done procedures."""
-    for valid_procedure in valid_procedures:
-        if isinstance(valid_procedure, int):
-            if valid_procedure in done_procedures:
+class Keywords(NamedTuple):
+    """A procedure keyword list split by kind: integer codes and text phrases."""
+    codes: FrozenSet[int]
+    phrases: Tuple[Tuple[str, str], ...]   # (keyword, lowercased keyword)
+
+
+@lru_cache(maxsize=None)
+def _keyword_table(valid_procedures: Tuple[Union[str, int], ...]) -> Keywords:
+    codes = frozenset(v for v in valid_procedures if isinstance(v, int))
+    phrases = tuple((v, v.lower()) for v in valid_procedures if not isinstance(v, int))
+    return Keywords(codes, phrases)
+
+
+def as_keywords(valid_procedures: Union[Keywords, List[Union[str, int]]]) -> Keywords:
+    """Partition a mixed keyword list once; pass the result to procedure_checker."""
+    if isinstance(valid_procedures, Keywords):
+        return valid_procedures
+    return _keyword_table(tuple(valid_procedures))
+
+
+def _check_codes(codes: FrozenSet[int], done_procedures: List[str]) -> bool:
+    return not codes.isdisjoint(done_procedures)
+
+
+def _check_phrases(
+    phrases: Tuple[Tuple[str, str], ...], done_procedures: List[str], done_lowered: List[str]
+) -> bool:
+    pairs = list(zip(done_procedures, done_lowered))
+    for valid_procedure, keyword in phrases:
+        for done_procedure, lowered in pairs:
+            if keyword in lowered and keyword_positive(done_procedure, valid_procedure, lowered):
                 return True
-        else:
-            for done_procedure in done_procedures:
-                if keyword_positive(done_procedure, valid_procedure):
-                    return True
     return False
 
 
+def procedure_checker(
+    valid_procedures: Union[Keywords, List[Union[str, int]]],
+    done_procedures: List[str],
+    done_lowered: Optional[List[str]] = None,
+) -> bool:
+    """Check if a valid procedure exists in the done procedures.
+
+    `valid_procedures` may be a plain list or a prebuilt `Keywords`;
+    `done_lowered` holds the lowercased `done_procedures` when already known.
+    """
+    codes, phrases = as_keywords(valid_procedures)
+    if codes and _check_codes(codes, done_procedures):
+        return True
+    if not phrases:
+        return False
+    if done_lowered is None:
+        done_lowered = [done.lower() for done in done_procedures]
+    return _check_phrases(phrases, done_procedures, done_lowered)
+
+
+_TREATMENT_MARKER = "Treatment:"
+
+
 def extract_treatment(text):
-    match = re.search(r"Treatment:\s*(.*)", text, re.DOTALL)
-    return match.group(1).strip() if match else None
+    # same as re.search(r"Treatment:\s*(.*)", DOTALL) + strip(): the \s* run
+    # is whitespace that strip() removes anyway, so this is one find()
+    start = text.find(_TREATMENT_MARKER)
+    return text[start + len(_TREATMENT_MARKER):].strip() if start != -1 else None
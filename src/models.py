@@ -7,196 +7,578 @@ provides:
 
   • completion_with_backoff(...) — a thin HTTP wrapper with retries and backoff
   • AzureLLM.invoke(messages) — a unified interface for GPT, Claude, Gemini, Llama, etc.
-  • get_tokenizer / count_tokens — utilities for token-counting and usage tracking
+  • acompletion_with_backoff(...) — the same wrapper as a coroutine over aiohttp
+  • stream_completion(...) — generator variant yielding reply text as it arrives
+  • ResponseCache — write-through reply cache behind both wrappers
+  • AzureLLM.batch([messages, …]) — several independent invokes dispatched together
+  • AzureLLM.ainvoke / abatch — async variants for asyncio-driven callers
+  • AzureLLM.stream(messages) — iterator over reply chunks
+  • get_tokenizer / count_tokens / token_lengths / count_tokens_batch — utilities for token-counting and usage tracking
   • load_model(model_key, …) — factory that returns a ready-to-use AzureLLM
 
 To use your own deployments or keys, simply update the endpoints and api_keys
 in config.yaml; no code changes required.
 """
 
+import asyncio
+import hashlib
 import json
+import random
+import sqlite3
+import threading
 import time
-import logging
-from typing import Any, List
-
-import requests
-from requests import Session
-
-from rich.console import Console
-from rich.logging import RichHandler
-
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
-
-import tiktoken
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, List, Optional
+
+import aiohttp
+import httpx
+import orjson
+
+# langchain_core and tiktoken are imported on first use (see _message_types /
+# _load_tokenizer), so importing this module for load_model or config checks stays cheap
 from src.config import CONFIG
+from src.prompts import StaticPrompt
 
 from src.utils.logging import console
 
 # —————————————————————————————
 # Global HTTP session & logger
 # —————————————————————————————
-session = Session()
+# HTTP/2 lets concurrent calls to the same Azure front door share one TLS
+# connection as multiplexed streams instead of one socket per request
+session = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=32, keepalive_expiry=60),
+    timeout=30.0,
+)
+
+# aiohttp sessions for the async path, one per event loop; created lazily
+# because a ClientSession must be opened inside the loop that will use it
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+def _get_async_session() -> "aiohttp.ClientSession":
+    loop = asyncio.get_running_loop()
+    sess = _async_sessions.get(loop)
+    if sess is None or sess.closed:
+        # no global cap (the semaphore in `abatch` bounds fan-out), a generous
+        # per-host pool, cached DNS and prompt cleanup of half-closed TLS sockets
+        connector = aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=64,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+            enable_cleanup_closed=True,
+        )
+        sess = _async_sessions[loop] = aiohttp.ClientSession(connector=connector)
+    return sess
+
+
 
 
 # —————————————————————————————
 # 1) completion_with_backoff
 # —————————————————————————————
+def _chat_completions_url(api_base: str, deployment_id: str, api_version: str) -> str:
+    return f"{api_base}/deployments/{deployment_id}/chat/completions?api-version={api_version}"
+
+
+def _chat_completions_body(k: dict, kwargs: dict):
+    # AzureLLM passes its precomputed url; build it for direct callers
+    url = kwargs.get("url") or _chat_completions_url(k["api_base"], k["deployment_id"], k["api_version"])
+    return url, {
+        "messages": k["messages"],
+        "max_tokens": k["max_tokens"],
+        "temperature": k["temperature"]
+    }
+
+
+def _claude_body(k: dict, kwargs: dict):
+    return k["api_base"], {
+        "model_id": k["deployment_id"],
+        "prompt_text": k["prompt_text"]
+    }
+
+
+def _gemini_body(k: dict, kwargs: dict):
+    return k["api_base"], {
+        "contents": [{
+            "role": "user",
+            "parts": [{"text": k["prompt_text"]}]
+        }],
+        "safety_settings": k["safety_settings"],
+        "generation_config": k["generation_config"]
+    }
+
+
+def _llama_body(k: dict, kwargs: dict):
+    # Format messages properly for Llama
+    formatted = kwargs.get("messages", [])
+    # If we were given prompt_text instead of messages, convert it
+    if not formatted and "prompt_text" in kwargs:
+        formatted = [{"role": "user", "content": k["prompt_text"]}]
+    return k["api_base"], {
+        "model": k["deployment_id"],
+        "messages": formatted,
+        "temperature": k["temperature"],
+        "max_tokens": k["max_tokens"]
+    }
+
+
+def _o3_mini_body(k: dict, kwargs: dict):
+    return k["api_base"], {
+        "messages": k["messages"],
+        "max_completion_tokens": k["max_tokens"]
+    }
+
+
+def _deepseek_body(k: dict, kwargs: dict):
+    return k["api_base"], {
+        "model": k["deployment_id"],
+        "messages": k["messages"],
+        "temperature": k["temperature"],
+        "max_tokens": k["max_tokens"],
+        "top_p": 1,
+        "stream": False
+    }
+
+
+def _chat_reply(data) -> str:
+    msg      = data["choices"][0]["message"]
+    content  = msg.get("content")           # may be None
+    if content in (None, ""):               # DeepSeek quirk
+        content = json.dumps(msg.get("tool_calls", {})) or ""
+    return content
+
+
+def _claude_reply(data) -> str:
+    cont = data.get("content")
+    if isinstance(cont, list):
+        return "".join(p.get("text", "") for p in cont)
+    return data.get("completion") or data.get("response", "")
+
+
+def _gemini_reply(data) -> str:
+    # handle both streaming‑array and non‑streaming dict
+    if isinstance(data, list):
+        data = {"candidates": [c for chunk in data for c in chunk.get("candidates", [])]}
+    return "".join(
+        part.get("text", "")
+        for cand in data.get("candidates", [])
+        for part in cand.get("content", {}).get("parts", [])
+    )
+
+
+# platform -> (url, body) builder; platform -> reply text parser.
+# A platform must appear in both to be supported.
+BODY_BUILDERS = {
+    "gpt":          _chat_completions_body,
+    "gpt-4.1":      _chat_completions_body,
+    "gpt-4.1-mini": _chat_completions_body,
+    "claude":       _claude_body,
+    "gemini":       _gemini_body,
+    "gemini-flash": _gemini_body,
+    "llama":        _llama_body,
+    "o3-mini":      _o3_mini_body,
+    "deepseek":     _deepseek_body,
+}
+RESPONSE_PARSERS = {
+    "gpt":          _chat_reply,
+    "gpt-4.1":      _chat_reply,
+    "gpt-4.1-mini": _chat_reply,
+    "llama":        _chat_reply,
+    "o3-mini":      _chat_reply,
+    "deepseek":     _chat_reply,
+    "claude":       _claude_reply,
+    "gemini":       _gemini_reply,
+    "gemini-flash": _gemini_reply,
+}
+
+
+@lru_cache(maxsize=8)
+def _headers(api_key: str) -> dict:
+    """Request headers for `api_key`; shared across calls, so never mutate the result."""
+    return {
+        "Content-Type": "application/json",
+        "Ocp-Apim-Subscription-Key": api_key
+    }
+
+
+def _build_request(**kwargs):
+    """Validate kwargs and return (platform, url, headers, body) for one call."""
+    platform = kwargs.get("platform", "").lower()
+    builder = BODY_BUILDERS.get(platform)
+    if builder is None:
+        raise ValueError("Unsupported platform")
+
+    k = {
+        "api_base":          kwargs.get("api_base", ""),
+        "deployment_id":     kwargs.get("deployment_identifier", ""),
+        "max_tokens":        kwargs.get("max_tokens", CONFIG.model_loading.default_max_tokens),
+        "temperature":       kwargs.get("temperature", CONFIG.model_loading.default_temperature),
+        "api_version":       kwargs.get("api_version", ""),
+        "messages":          kwargs.get("messages", []),
+        "prompt_text":       kwargs.get("prompt_text", ""),
+        "safety_settings":   kwargs.get("safety_settings", []),
+        "generation_config": kwargs.get("generation_config", {}),
+    }
+
+    headers = _headers(kwargs.get("api_key", ""))
+
+    url, body = builder(k, kwargs)
+    return platform, url, headers, body
+
+
+def _parse_response(platform: str, data) -> str:
+    """Normalise a provider's JSON reply to the completion text."""
+    return RESPONSE_PARSERS[platform](data)
+
+
+# Exponential backoff parameters
+_INITIAL_DELAY  = 1   # seconds - initial sleep duration
+_MAX_DELAY      = 60  # seconds - maximum sleep duration
+_BACKOFF_FACTOR = 2   # exponential factor
+_MAX_ATTEMPTS   = 5
+_ASYNC_TIMEOUT  = aiohttp.ClientTimeout(total=30)
+
+
+def _retry_delay(attempt: int, retry_after=None) -> float:
+    """
+    Seconds to wait before the next attempt: the server's numeric Retry-After
+    when given, otherwise AWS-style full jitter, uniform(0, min(cap, base * 2**attempt)),
+    so workers that failed together do not retry together.
+    """
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass   # HTTP-date form; fall back to jitter
+    return random.uniform(0, min(_MAX_DELAY, _INITIAL_DELAY * _BACKOFF_FACTOR ** attempt))
+
+
+class ResponseCache:
+    """
+    Write-through cache of completion texts keyed on a hash of the request.
+    Always held in memory; also persisted to SQLite when `path` is set
+    (CONFIG.runtime.llm_cache_path), so re-runs and ablations replay replies.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._mem = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS replies (key TEXT PRIMARY KEY, content TEXT)")
+            self._db.commit()
+
+    @staticmethod
+    def key(kwargs: dict) -> str:
+        """Canonical hash of the request kwargs (credentials and the derived url excluded)."""
+        request = {k: v for k, v in kwargs.items() if k not in ("api_key", "url")}
+        return hashlib.blake2b(
+            orjson.dumps(request, option=orjson.OPT_SORT_KEYS), digest_size=16
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            content = self._mem.get(key)
+            if content is None and self._db is not None:
+                row = self._db.execute("SELECT content FROM replies WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    content = self._mem[key] = row[0]
+            return content
+
+    def set(self, key: str, content: str) -> None:
+        with self._lock:
+            self._mem[key] = content
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO replies VALUES (?, ?)", (key, content))
+                self._db.commit()
+
+
+_response_cache = None
+
+
+def _cache_lookup(kwargs: dict):
+    """
+    Pop the cache controls off `kwargs` and return (cache key or None, cached reply).
+
+    `cache=None` (default) caches deterministic (temperature 0) requests only;
+    `cache=True` opts a sampled request in, `cache=False` opts out. With
+    `cache_bust=True` the call always goes to the endpoint and overwrites the
+    stored reply.
+    """
+    global _response_cache
+    use_cache = kwargs.pop("cache", None)
+    cache_bust = kwargs.pop("cache_bust", False)
+    if use_cache is None:
+        use_cache = kwargs.get("temperature", CONFIG.model_loading.default_temperature) == 0
+    if not use_cache:
+        return None, None
+    if _response_cache is None:
+        _response_cache = ResponseCache(getattr(CONFIG.runtime, "llm_cache_path", None))
+    try:
+        key = ResponseCache.key(kwargs)
+    except TypeError:   # something in the request orjson cannot serialise
+        return None, None
+    return key, (None if cache_bust else _response_cache.get(key))
+
+
+def _cache_store(key: Optional[str], content: str) -> str:
+    if key is not None and content is not None and not content.startswith("[ERROR]"):
+        _response_cache.set(key, content)
+    return content
+
+
 def completion_with_backoff(**kwargs) -> str:
     """
     Thin HTTP wrapper around the various LLM proxy endpoints with automatic
     retries, connection reuse (global `session`) and a 30-second timeout.
+    Replies may be served from / written to the response cache (see
+    `_cache_lookup` for the `cache` / `cache_bust` kwargs).
 
     Expected kwargs:
         platform, api_base, api_key, deployment_identifier, messages / prompt_text …
+        url (optional; a prebuilt chat-completions URL for the GPT platforms)
     """
-    platform = kwargs.get("platform", "").lower()
-    if platform not in {"gpt", "claude", "gemini", "llama", "o3-mini", "deepseek", "gemini-flash", "gpt-4.1", "gpt-4.1-mini"}:
-        raise ValueError("Unsupported platform")
+    cache_key, cached = _cache_lookup(kwargs)
+    if cached is not None:
+        return cached
+    return _cache_store(cache_key, _completion_with_backoff(**kwargs))
 
-    api_base      = kwargs.get("api_base", "")
-    api_key       = kwargs.get("api_key", "")
-    deployment_id = kwargs.get("deployment_identifier", "")
-    max_tokens    = kwargs.get("max_tokens", CONFIG.model_loading.default_max_tokens)
-    temperature   = kwargs.get("temperature", CONFIG.model_loading.default_temperature)
-    api_version   = kwargs.get("api_version", "")
-    messages      = kwargs.get("messages", [])
-    prompt_text   = kwargs.get("prompt_text", "")
-    safety_settings   = kwargs.get("safety_settings", [])
-    generation_config = kwargs.get("generation_config", {})
-
-    headers = {
-        "Content-Type": "application/json",
-        "Ocp-Apim-Subscription-Key": api_key
-    }
 
-    # Exponential backoff parameters
-    initial_delay = 1  # seconds - initial sleep duration
-    max_delay     = 60 # seconds - maximum sleep duration
-    backoff_factor = 2 # exponential factor
-    
-    delay = initial_delay  # start with initial delay
+def _completion_with_backoff(**kwargs) -> str:
+    platform, url, headers, body = _build_request(**kwargs)
+    # serialise once with orjson; headers already carry the JSON content type
+    payload = orjson.dumps(body)
+
     resp = None
 
-    for attempt in range(5):
+    for attempt in range(_MAX_ATTEMPTS):
         try:
-            # -------- build request per provider --------------------------------
-            if platform in {"gpt", "gpt-4.1", "gpt-4.1-mini"}:
-                url  = f"{api_base}/deployments/{deployment_id}/chat/completions?api-version={api_version}"
-                body = {
-                    "messages": messages,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature
-                }
-
-            elif platform == "claude":
-                url  = api_base
-                body = {
-                    "model_id": deployment_id,
-                    "prompt_text": prompt_text
-                }
-
-            elif platform == "gemini":
-                url  = api_base
-                body = {
-                    "contents": [{
-                        "role": "user",
-                        "parts": [{"text": prompt_text}]
-                    }],
-                    "safety_settings": safety_settings,
-                    "generation_config": generation_config
-                }
-
-            elif platform == "gemini-flash":
-                url  = api_base
-                body = {
-                    "contents": [{
-                        "role": "user",
-                        "parts": [{"text": prompt_text}]
-                    }],
-                    "safety_settings": safety_settings,
-                    "generation_config": generation_config
-                }
-
-            elif platform == "llama":
-                url  = api_base
-                # Format messages properly for Llama
-                formatted = kwargs.get("messages", [])
-                # If we were given prompt_text instead of messages, convert it
-                if not formatted and "prompt_text" in kwargs:
-                    formatted = [{"role": "user", "content": prompt_text}]
-                body = {
-                    "model": deployment_id,
-                    "messages": formatted,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens
-                }
-
-            elif platform == "o3-mini":
-                url  = api_base
-                body = {
-                    "messages": messages,
-                    "max_completion_tokens": max_tokens
-                }
-
-            elif platform == "deepseek":
-                url  = api_base
-                body = {
-                    "model": deployment_id,
-                    "messages": messages,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "top_p": 1,
-                    "stream": False
-                }
-
             # -------- send the request ------------------------------------------
-            resp = session.post(url, headers=headers, json=body, timeout=30)
+            resp = session.post(url, headers=headers, content=payload)
             resp.raise_for_status()
-            data = resp.json()
-
-            # -------- normalise output ------------------------------------------
-            if platform in {"gpt", "gpt-4.1", "gpt-4.1-mini", "llama", "o3-mini", "deepseek"}:
-                msg      = data["choices"][0]["message"]
-                content  = msg.get("content")           # may be None
-                if content in (None, ""):               # DeepSeek quirk
-                    content = json.dumps(msg.get("tool_calls", {})) or ""
-                return content
-
-            if platform == "claude":
-                cont = data.get("content")
-                if isinstance(cont, list):
-                    return "".join(p.get("text", "") for p in cont)
-                return data.get("completion") or data.get("response", "")
-
-            if platform in {"gemini", "gemini-flash"}:
-                # handle both streaming‑array and non‑streaming dict
-                if isinstance(data, list):
-                    data = {"candidates": [c for chunk in data for c in chunk.get("candidates", [])]}
-                return "".join(
-                    part.get("text", "")
-                    for cand in data.get("candidates", [])
-                    for part in cand.get("content", {}).get("parts", [])
-                )
+            return _parse_response(platform, orjson.loads(resp.content))
 
-        except requests.RequestException as e:
+        # ValueError (incl. orjson.JSONDecodeError): an undecodable body, which
+        # requests used to raise as a RequestException
+        except (httpx.HTTPError, ValueError) as e:
             console.log(f"[red]Request failed on attempt {attempt + 1}: {e}")
             status = getattr(resp, "status_code", None)
             if status == 429:
+                delay = _retry_delay(attempt, resp.headers.get("Retry-After"))
                 console.log(f"[yellow]Rate limit hit. Backing off for {delay:.2f} seconds…")
-                time.sleep(delay)
-                delay = min(delay * backoff_factor, max_delay)
             else:
-                time.sleep(initial_delay)
-                
+                delay = _retry_delay(attempt)
+            time.sleep(delay)
+
             # reset for next retry
             resp = None
 
     return f"[ERROR] exceeded retries for {platform}"
 
 
+async def acompletion_with_backoff(**kwargs) -> str:
+    """
+    Coroutine twin of `completion_with_backoff`: same request bodies, retry,
+    backoff and caching policy, but sent over the shared aiohttp session so
+    many calls can be awaited concurrently.
+    """
+    cache_key, cached = _cache_lookup(kwargs)
+    if cached is not None:
+        return cached
+    return _cache_store(cache_key, await _acompletion_with_backoff(**kwargs))
+
+
+async def _acompletion_with_backoff(**kwargs) -> str:
+    platform, url, headers, body = _build_request(**kwargs)
+    client = _get_async_session()
+    # serialise once with orjson; headers already carry the JSON content type
+    payload = orjson.dumps(body)
+
+    for attempt in range(_MAX_ATTEMPTS):
+        status = retry_after = None
+        try:
+            async with client.post(
+                url, headers=headers, data=payload, timeout=_ASYNC_TIMEOUT
+            ) as resp:
+                status = resp.status
+                retry_after = resp.headers.get("Retry-After")
+                resp.raise_for_status()
+                # proxies are inconsistent about Content-Type; don't sniff it
+                data = await resp.json(content_type=None, loads=orjson.loads)
+            return _parse_response(platform, data)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
+            console.log(f"[red]Request failed on attempt {attempt + 1}: {e}")
+            if status == 429:
+                delay = _retry_delay(attempt, retry_after)
+                console.log(f"[yellow]Rate limit hit. Backing off for {delay:.2f} seconds…")
+            else:
+                delay = _retry_delay(attempt)
+            await asyncio.sleep(delay)
+
+    return f"[ERROR] exceeded retries for {platform}"
+
+
+def _chat_delta(data) -> str:
+    return "".join(
+        (choice.get("delta") or {}).get("content") or ""
+        for choice in data.get("choices") or []
+    )
+
+
+# platform -> text of one streamed JSON chunk. Platforms missing here are not
+# streamed: stream_completion yields their buffered reply as a single chunk.
+STREAM_PARSERS = {
+    "gpt":          _chat_delta,
+    "gpt-4.1":      _chat_delta,
+    "gpt-4.1-mini": _chat_delta,
+    "gemini":       _gemini_reply,
+    "gemini-flash": _gemini_reply,
+}
+
+
+def _iter_json_chunks(lines):
+    """
+    Yield the JSON objects of a streamed reply, read line by line. Handles
+    SSE (`data: {...}`), NDJSON and a (possibly pretty-printed) JSON array
+    of objects, which is how Gemini's stream endpoints deliver candidates.
+    """
+    buf = ""
+    for line in lines:
+        line = line.strip()
+        if line.startswith("data:"):
+            line = line[5:].strip()
+        if not buf:
+            if not line or line == "[DONE]":
+                continue
+            try:   # the common case: one whole object (or array of them) per line
+                data = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                pass
+            else:
+                yield from (data if isinstance(data, list) else [data])
+                continue
+            # between objects: drop array brackets / separators
+            line = line.lstrip("[,").strip()
+            if line in ("", "]"):
+                continue
+        buf += line
+        candidate = buf.rstrip(",]").rstrip()
+        if candidate.endswith("}"):
+            try:
+                obj = orjson.loads(candidate)
+            except orjson.JSONDecodeError:
+                continue   # object spans more lines
+            buf = ""
+            yield obj
+    if buf.strip():
+        raise ValueError(f"truncated streamed reply: {buf[:80]!r}")
+
+
+def stream_completion(**kwargs):
+    """
+    Generator twin of `completion_with_backoff`, yielding the reply text in
+    chunks as the endpoint produces them (GPT via SSE, Gemini via its
+    streamed candidate array). Same kwargs, cache and retry policy; a call
+    is only retried if it fails before the first chunk was yielded.
+    """
+    cache_key, cached = _cache_lookup(kwargs)
+    if cached is not None:
+        yield cached
+        return
+    chunks = []
+    for chunk in _stream_completion(**kwargs):
+        chunks.append(chunk)
+        yield chunk
+    _cache_store(cache_key, "".join(chunks))
+
+
+def _stream_completion(**kwargs):
+    parse = STREAM_PARSERS.get(kwargs.get("platform", "").lower())
+    if parse is None:
+        yield _completion_with_backoff(**kwargs)
+        return
+    platform, url, headers, body = _build_request(**kwargs)
+    if parse is _chat_delta:
+        body["stream"] = True
+    payload = orjson.dumps(body)
+    started = False
+
+    for attempt in range(_MAX_ATTEMPTS):
+        status = retry_after = None
+        try:
+            with session.stream("POST", url, headers=headers, content=payload) as resp:
+                status = resp.status_code
+                retry_after = resp.headers.get("Retry-After")
+                resp.raise_for_status()
+                for data in _iter_json_chunks(resp.iter_lines()):
+                    text = parse(data)
+                    if text:
+                        started = True
+                        yield text
+            return
+
+        except (httpx.HTTPError, ValueError) as e:
+            if started:
+                raise   # part of the reply is already with the caller
+            console.log(f"[red]Request failed on attempt {attempt + 1}: {e}")
+            if status == 429:
+                delay = _retry_delay(attempt, retry_after)
+                console.log(f"[yellow]Rate limit hit. Backing off for {delay:.2f} seconds…")
+            else:
+                delay = _retry_delay(attempt)
+            time.sleep(delay)
+
+    yield f"[ERROR] exceeded retries for {platform}"
+
+
 # —————————————————————————————
 # 2) AzureLLM class 
 # —————————————————————————————
+@lru_cache(maxsize=1)
+def _message_types():
+    """(SystemMessage, HumanMessage, AIMessage, ToolMessage), imported on first call."""
+    from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+    return SystemMessage, HumanMessage, AIMessage, ToolMessage
+
+
+@lru_cache(maxsize=1)
+def _prompt_affix_table():
+    """(prefix, suffix) wrapped around each message in the flat Claude/Gemini prompt."""
+    SystemMessage, HumanMessage, AIMessage, ToolMessage = _message_types()
+    return {
+        SystemMessage: ("<system>\n", "\n</system>\n\n"),
+        HumanMessage:  ("Human: ", "\n\n"),
+        AIMessage:     ("Assistant: ", "\n\n"),
+        ToolMessage:   ("Tool Result: ", "\n\n"),
+    }
+
+
+_DEFAULT_AFFIXES = ("", "\n\n")
+
+
+def _prompt_affixes(m):
+    table = _prompt_affix_table()
+    affixes = table.get(type(m))
+    if affixes is None:
+        # subclasses (e.g. message chunks) keep their base type's wrapping
+        affixes = next(
+            (a for cls, a in table.items() if isinstance(m, cls)), _DEFAULT_AFFIXES
+        )
+    return affixes
+
+
+# background workers for token accounting; tiktoken releases the GIL while encoding
+_TOKEN_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="token-count")
+
+
 class AzureLLM:
     """
     Wrapper for various endpoints: GPT, Claude, Gemini, or Llama, 
@@ -219,24 +601,62 @@ class AzureLLM:
         self.api_version = api_version
         self.temperature = temperature
         self.max_tokens = max_tokens
-        # Token tracking
-        self.last_input_tokens = 0
-        self.last_output_tokens = 0
-        self.total_input_tokens = 0
-        self.total_output_tokens = 0
-
-    def invoke(self, messages: List[Any]) -> str:
-        # Count input tokens
-        input_tokens = 0
+        # Endpoint URL when it is derived from the fields above (Azure chat
+        # completions); None for platforms that post to api_base directly
+        self._url = (
+            _chat_completions_url(api_base, deployment_identifier, api_version)
+            if BODY_BUILDERS.get(self.platform) is _chat_completions_body else None
+        )
+        self._reset_token_counters()
+
+    def _reset_token_counters(self) -> None:
+        # Token tracking; counts are filled in on _TOKEN_POOL, and reading any
+        # of the counters below waits for the ones still in flight
+        self._last_input_tokens = 0
+        self._last_output_tokens = 0
+        self._total_input_tokens = 0
+        self._total_output_tokens = 0
+        self._tokens_pending = 0
+        self._tokens_cond = threading.Condition()
+
+    def clone(self) -> "AzureLLM":
+        """Same endpoint and settings (precomputed URL included), fresh token counters."""
+        twin = object.__new__(type(self))
+        for attr in ("platform", "api_base", "api_key", "deployment_identifier",
+                     "api_version", "temperature", "max_tokens", "_url"):
+            setattr(twin, attr, getattr(self, attr))
+        twin._reset_token_counters()
+        return twin
+
+    def _settled(self, attr: str) -> int:
+        with self._tokens_cond:
+            self._tokens_cond.wait_for(lambda: self._tokens_pending == 0)
+            return getattr(self, attr)
+
+    last_input_tokens   = property(lambda self: self._settled("_last_input_tokens"))
+    last_output_tokens  = property(lambda self: self._settled("_last_output_tokens"))
+    total_input_tokens  = property(lambda self: self._settled("_total_input_tokens"))
+    total_output_tokens = property(lambda self: self._settled("_total_output_tokens"))
+
+    def _prepare(self, messages: List[Any]):
+        """
+        Map `messages` to completion kwargs (None if unsupported). Also returns
+        the cached token count of any static prompts plus the remaining texts
+        to encode, which `_record` tokenizes together with the reply.
+        """
+        SystemMessage, HumanMessage, AIMessage, ToolMessage = _message_types()
+        texts = []
+        static_tokens = 0
         for m in messages:
-            if isinstance(m, SystemMessage):
-                input_tokens += count_tokens(m.content, self.platform)
-            elif isinstance(m, HumanMessage):
-                input_tokens += count_tokens(m.content, self.platform)
-            elif isinstance(m, AIMessage):
-                input_tokens += count_tokens(m.content, self.platform)
+            if isinstance(m, (SystemMessage, HumanMessage, AIMessage)):
+                if isinstance(m.content, StaticPrompt):
+                    # fixed system prompts carry their own cached count
+                    static_tokens += m.content.token_count(self.platform)
+                else:
+                    texts.append(m.content)
             elif isinstance(m, ToolMessage):
-                input_tokens += count_tokens(str(m.content), self.platform)
+                texts.append(str(m.content))
+        token_inputs = (static_tokens, texts)
 
         # Convert messages to the correct format for the chosen platform
         if self.platform in ["gpt", "gpt-4.1", "gpt-4.1-mini", "llama", "deepseek", "o3-mini"]:
@@ -279,37 +699,31 @@ class AzureLLM:
                 "api_version":          self.api_version,
                 "messages":             mapped_msgs
             }
+            if self._url is not None:
+                params["url"] = self._url
             # For o3-mini, use max_completion_tokens instead of max_tokens
             if self.platform == "o3-mini":
                 params["max_completion_tokens"] = self.max_tokens
             else:
                 params["max_tokens"]    = self.max_tokens
                 params["temperature"]   = self.temperature
+            return token_inputs, params
 
-            result = completion_with_backoff(**params)
-
-        elif self.platform in ["claude", "gemini", "gemini-flash"]:
+        if self.platform in ["claude", "gemini", "gemini-flash"]:
             # FIXED: Use message-style formatting for Claude/Gemini instead of concatenating
             # This preserves conversation structure better
-            prompt_text = ""
-            for m in messages:
-                if isinstance(m, SystemMessage):
-                    prompt_text += f"<system>\n{m.content}\n</system>\n\n"
-                elif isinstance(m, HumanMessage):
-                    prompt_text += f"Human: {m.content}\n\n"
-                elif isinstance(m, AIMessage):
-                    prompt_text += f"Assistant: {m.content}\n\n"
-                elif isinstance(m, ToolMessage):
-                    prompt_text += f"Tool Result: {m.content}\n\n"
-                else:
-                    prompt_text += f"{m.content}\n\n"
+            prompt_text = "".join(
+                f"{prefix}{m.content}{suffix}"
+                for m in messages
+                for prefix, suffix in (_prompt_affixes(m),)
+            )
 
             # End with an "Assistant: " prompt to indicate it's the model's turn
             if not prompt_text.endswith("Assistant: "):
                 prompt_text += "Assistant: "
 
             if self.platform == "claude":
-                result = completion_with_backoff(
+                return token_inputs, dict(
                     platform="claude",
                     api_base=self.api_base,
                     api_key=self.api_key,  # Use the instance's API key
@@ -318,57 +732,159 @@ class AzureLLM:
                     temperature=self.temperature,
                     prompt_text=prompt_text
                 )
-            else:  # "gemini" or "gemini-flash"
-                result = completion_with_backoff(
-                    platform="gemini",
-                    api_base=self.api_base,
-                    api_key=self.api_key,  # Use the instance's API key
-                    deployment_identifier=self.deployment_identifier,
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    prompt_text=prompt_text,
-                    safety_settings=[{"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", 
-                                      "threshold": "BLOCK_LOW_AND_ABOVE"}],
-                    generation_config={"temperature": self.temperature, "topP": 0.8, "topK": 40}
-                )
-
-        else:
-            result = "Error: Unsupported platform"
+            # "gemini" or "gemini-flash"
+            return token_inputs, dict(
+                platform="gemini",
+                api_base=self.api_base,
+                api_key=self.api_key,  # Use the instance's API key
+                deployment_identifier=self.deployment_identifier,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                prompt_text=prompt_text,
+                safety_settings=[{"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", 
+                                  "threshold": "BLOCK_LOW_AND_ABOVE"}],
+                generation_config={"temperature": self.temperature, "topP": 0.8, "topK": 40}
+            )
+
+        return token_inputs, None
+
+    def _record(self, token_inputs, result: str) -> str:
+        # Token accounting is metrics only: hand it to the pool and return the reply
+        with self._tokens_cond:
+            self._tokens_pending += 1
+        _TOKEN_POOL.submit(self._count_tokens, token_inputs, result)
+        return result
 
-        # Count output tokens
-        output_tokens = count_tokens(result, self.platform)
+    def _count_tokens(self, token_inputs, result: str) -> None:
+        input_tokens = output_tokens = 0
+        try:
+            # Count input and output tokens in one batched encode
+            static_tokens, texts = token_inputs
+            lens = token_lengths(
+                [*texts, result], self.platform,
+                exact_threshold=_SHORT_TEXT if approx_token_counts() else 0,
+            )
+            input_tokens = static_tokens + sum(lens[:-1])
+            output_tokens = lens[-1]
+        finally:
+            # Store token counts
+            with self._tokens_cond:
+                self._last_input_tokens = input_tokens
+                self._last_output_tokens = output_tokens
+                self._total_input_tokens += input_tokens
+                self._total_output_tokens += output_tokens
+                self._tokens_pending -= 1
+                self._tokens_cond.notify_all()
 
-        # Store token counts
-        self.last_input_tokens = input_tokens
-        self.last_output_tokens = output_tokens
-        self.total_input_tokens += input_tokens
-        self.total_output_tokens += output_tokens
+    def invoke(self, messages: List[Any]) -> str:
+        token_inputs, params = self._prepare(messages)
+        if params is None:
+            result = "Error: Unsupported platform"
+        else:
+            result = completion_with_backoff(**params)
+        return self._record(token_inputs, result)
 
-        return result
+    async def ainvoke(self, messages: List[Any]) -> str:
+        """`invoke` as a coroutine, sending the request via `acompletion_with_backoff`."""
+        token_inputs, params = self._prepare(messages)
+        if params is None:
+            result = "Error: Unsupported platform"
+        else:
+            result = await acompletion_with_backoff(**params)
+        return self._record(token_inputs, result)
+
+    def stream(self, messages: List[Any]):
+        """
+        Like `invoke`, but return an iterator over the reply chunks as they
+        arrive (see `stream_completion`). Tokens are recorded once the
+        iterator is exhausted or closed.
+        """
+        token_inputs, params = self._prepare(messages)
+        if params is None:
+            self._record(token_inputs, "Error: Unsupported platform")
+            return iter(["Error: Unsupported platform"])
+        return self._stream(token_inputs, params)
+
+    def _stream(self, token_inputs, params):
+        chunks = []
+        try:
+            for chunk in stream_completion(**params):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            self._record(token_inputs, "".join(chunks))
+
+    def batch(self, batch_messages: List[List[Any]], max_workers: int = 8) -> List[str]:
+        """
+        Invoke several independent prompts, returning replies in input order.
+        The proxy endpoints take one conversation per request, so this fans
+        the requests out over a thread pool sharing the global `session`.
+        Token counters accumulate across the batch; `last_*` reflect the
+        final reply to finish.
+        """
+        if len(batch_messages) <= 1:
+            return [self.invoke(m) for m in batch_messages]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batch_messages))) as pool:
+            return list(pool.map(self.invoke, batch_messages))
+
+    async def abatch(self, batch_messages: List[List[Any]], concurrency: int = 16) -> List[str]:
+        """
+        Async `batch`: all prompts are awaited together on one event loop,
+        with at most `concurrency` requests in flight. Replies come back in
+        input order.
+        """
+        limit = asyncio.Semaphore(concurrency)
+
+        async def one(messages):
+            async with limit:
+                return await self.ainvoke(messages)
+
+        return list(await asyncio.gather(*(one(m) for m in batch_messages)))
 
 
 # —————————————————————————————
 # 3) Token counting
 # —————————————————————————————
-def get_tokenizer(model_name):
-    """
-    Get the appropriate tokenizer based on the model name.
-    """
+def _encoding_name_for(model_name: str) -> str:
+    """Canonical tokenizer key for a model name (what get_tokenizer caches on)."""
     model_name = model_name.lower()
-    
+    if "gpt-4" in model_name or "gpt4" in model_name or "gpt-4o" in model_name:
+        return "gpt-4"
+    elif "gpt-3.5" in model_name or "gpt3" in model_name:
+        return "gpt-3.5-turbo"
+    # claude / llama / gemini / deepseek and anything else use cl100k_base
+    return "cl100k_base"
+
+
+@lru_cache(maxsize=16)
+def _load_tokenizer(encoding: str):
+    import tiktoken
     try:
-        if "gpt-4" in model_name or "gpt4" in model_name or "gpt-4o" in model_name:
-            return tiktoken.encoding_for_model("gpt-4")
-        elif "gpt-3.5" in model_name or "gpt3" in model_name:
-            return tiktoken.encoding_for_model("gpt-3.5-turbo")
-        elif "claude" in model_name or "llama" in model_name or "gemini" in model_name or "deepseek" in model_name:
+        if encoding == "cl100k_base":
             # Directly get the cl100k_base encoding instead of trying to map it to a model
             return tiktoken.get_encoding("cl100k_base")
-        else:
-            # Default to cl100k_base as a fallback, using get_encoding
-            return tiktoken.get_encoding("cl100k_base")
+        return tiktoken.encoding_for_model(encoding)
     except Exception as e:
         print(f"Error getting tokenizer: {e}")
+        raise
+
+
+# platform -> loaded encoding; the handful of platform strings seen at run time
+# skip even the name normalisation after their first lookup
+_TOKENIZERS = {}
+
+
+def get_tokenizer(model_name):
+    """
+    Get the appropriate tokenizer based on the model name.
+    """
+    tokenizer = _TOKENIZERS.get(model_name)
+    if tokenizer is None:
+        try:
+            tokenizer = _TOKENIZERS[model_name] = _load_tokenizer(_encoding_name_for(model_name))
+        except Exception:
+            return None
+    return tokenizer
         
 
 def count_tokens(text, model_name):
@@ -385,9 +901,64 @@ def count_tokens(text, model_name):
         return len(text) // 4  # Rough approximation
 
 
+# Texts shorter than this are approximated rather than encoded, but only when
+# approximate accounting is opted into with TOKEN_COUNT_APPROX=1
+_SHORT_TEXT = 64
+
+
+def approx_token_counts() -> bool:
+    """Whether TOKEN_COUNT_APPROX is set; token counts are exact otherwise."""
+    return bool(os.environ.get("TOKEN_COUNT_APPROX"))
+
+
+def _approx_tokens(text) -> int:
+    # same len // 4 rule as the count_tokens fallback, but non-empty text is at least 1
+    return max(1, len(text) // 4) if text else 0
+
+
+def token_lengths(texts, model_name, num_threads: int = 4, exact_threshold: int = 0):
+    """
+    Per-text token counts for `texts`, encoded in one `encode_batch` call
+    (tiktoken releases the GIL and spreads the strings over `num_threads`).
+    Texts shorter than `exact_threshold` are approximated without calling the
+    tokenizer (0, the default, encodes everything).
+    Falls back to `count_tokens` per text if the batch cannot be encoded.
+    """
+    if exact_threshold:
+        lens = [_approx_tokens(t) if len(t) < exact_threshold else None for t in texts]
+        exact = iter(token_lengths([t for t, n in zip(texts, lens) if n is None], model_name, num_threads))
+        return [next(exact) if n is None else n for n in lens]
+    if len(texts) <= 1:
+        return [count_tokens(t, model_name) for t in texts]
+    try:
+        tokenizer = get_tokenizer(model_name)
+        return [len(ids) for ids in tokenizer.encode_batch(texts, num_threads=num_threads)]
+    except Exception:
+        return [count_tokens(t, model_name) for t in texts]
+
+
+def count_tokens_batch(texts, model_name, num_threads: int = 4):
+    """Total token count over `texts` (see `token_lengths`)."""
+    return sum(token_lengths(texts, model_name, num_threads))
+
+
 # —————————————————————————————
 # 4) load_model
 # —————————————————————————————
+# platform -> (CONFIG.endpoints section, whether the endpoint takes api_version)
+ENDPOINT_MAP = {
+    "gpt-4.1":      ("gpt41", True),        # GPT-4.1 family on East US2
+    "gpt-4.1-mini": ("gpt41mini", True),
+    "gpt":          ("gpt", True),          # GPT-4 default
+    "claude":       ("claude", False),
+    "gemini-flash": ("gemini_flash", False),
+    "gemini":       ("gemini", False),
+    "llama":        ("llama", False),
+    "o3-mini":      ("o3_mini", True),
+    "deepseek":     ("deepseek_r1", False),
+}
+
+
 def load_model(
     model_id: str,
     matcher: bool = False,
@@ -396,63 +967,28 @@ def load_model(
     """
     Instantiate AzureLLM by mapping model_id to its API base, deployment_id,
     and version via CONFIG or edge-case defaults exactly as in the original.
+    The CONFIG lookup runs once per (model_id, matcher, temperature); each
+    call returns a clone so every agent keeps its own token counters.
     """
-    platform = model_id.lower()
+    return _load_model_cached(model_id, matcher, temperature).clone()
 
-    # GPT-4.1 family on East US2
-    if platform == "gpt-4.1":
-        api_base              = CONFIG.endpoints.gpt41.api_base
-        deployment_identifier = CONFIG.endpoints.gpt41.model_id
-        api_version           = CONFIG.endpoints.gpt41.api_version
-
-    elif platform == "gpt-4.1-mini":
-        api_base              = CONFIG.endpoints.gpt41mini.api_base
-        deployment_identifier = CONFIG.endpoints.gpt41mini.model_id
-        api_version           = CONFIG.endpoints.gpt41mini.api_version
-
-    # GPT-4 default
-    elif platform == "gpt":
-        api_base              = CONFIG.endpoints.gpt.api_base
-        deployment_identifier = CONFIG.endpoints.gpt.model_id
-        api_version           = CONFIG.endpoints.gpt.api_version
-
-    elif platform == "claude":
-        api_base              = CONFIG.endpoints.claude.api_base
-        deployment_identifier = CONFIG.endpoints.claude.model_id
-        api_version           = ""   # Claude doesn't use this
-
-    elif platform == "gemini-flash":
-        api_base              = CONFIG.endpoints.gemini_flash.api_base
-        deployment_identifier = CONFIG.endpoints.gemini_flash.model_id
-        api_version           = ""
-
-    elif platform == "gemini":
-        api_base              = CONFIG.endpoints.gemini.api_base
-        deployment_identifier = CONFIG.endpoints.gemini.model_id
-        api_version           = ""  # Gemini doesn't use this
-
-    elif platform == "llama":
-        api_base              = CONFIG.endpoints.llama.api_base
-        deployment_identifier = CONFIG.endpoints.llama.model_id
-        api_version           = ""   # Llama doesn't use this
-
-    elif platform == "o3-mini":
-        api_base              = CONFIG.endpoints.o3_mini.api_base
-        deployment_identifier = CONFIG.endpoints.o3_mini.model_id
-        api_version           = CONFIG.endpoints.o3_mini.api_version
-
-    elif platform == "deepseek":
-        api_base              = CONFIG.endpoints.deepseek_r1.api_base
-        deployment_identifier = CONFIG.endpoints.deepseek_r1.model_id
-        api_version           = ""    # DeepSeek doesn't use this
 
-    else:
+@lru_cache(maxsize=32)
+def _load_model_cached(model_id: str, matcher: bool, temperature: float) -> AzureLLM:
+    platform = model_id.lower()
+
+    endpoint = ENDPOINT_MAP.get(platform)
+    if endpoint is None:
         # Default to OpenAI (but warn)
         console.log(f"[yellow]Unknown model '{model_id}', defaulting to gpt")
-        api_base              = CONFIG.endpoints.gpt.api_base
-        deployment_identifier = CONFIG.endpoints.gpt.model_id
-        api_version           = CONFIG.endpoints.gpt.api_version
-        platform              = "gpt"  # Force to GPT mode for unknown models
+        platform = "gpt"  # Force to GPT mode for unknown models
+        endpoint = ENDPOINT_MAP[platform]
+    section, has_version = endpoint
+    cfg = getattr(CONFIG.endpoints, section)
+    api_base              = cfg.api_base
+    deployment_identifier = cfg.model_id
+    # Claude, Gemini, Llama and DeepSeek endpoints don't use an api_version
+    api_version           = cfg.api_version if has_version else ""
 
     
     if platform == "gpt":
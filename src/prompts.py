@@ -1,9 +1,46 @@
 # src/prompts.py
+from string import Formatter
+
+
+class StaticPrompt(str):
+    """
+    A fixed system prompt. Behaves exactly like the str it wraps, but keeps
+    its token count per platform so the few-KB text is tokenized once per
+    process instead of on every LLM call that resends it.
+    """
+
+    def token_count(self, platform: str) -> int:
+        counts = self.__dict__.setdefault("_token_counts", {})
+        if platform not in counts:
+            from .models import count_tokens   # models imports CONFIG; keep prompts import-light
+            counts[platform] = count_tokens(str(self), platform)
+        return counts[platform]
+
+
+def compile_template(template: str):
+    """
+    Precompile a `str.format` template with plain named fields. The returned
+    callable takes the fields as keywords and is equivalent to
+    `template.format(**values)`, without re-parsing the template per call.
+    """
+    parts = [(lit, field) for lit, field, _, _ in Formatter().parse(template)]
+    if len(parts) == 1 and parts[0][1] is not None:
+        # "<prefix>{field}"
+        (prefix, field), = parts
+        return lambda **values: f"{prefix}{values[field]}"
+    if len(parts) == 2 and parts[0][1] is not None and parts[1][1] is None:
+        # "<prefix>{field}<suffix>"
+        (prefix, field), (suffix, _) = parts
+        return lambda **values: f"{prefix}{values[field]}{suffix}"
+    return lambda **values: "".join(
+        lit + str(values[field]) if field is not None else lit for lit, field in parts
+    )
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Single-agent prompts
 # ──────────────────────────────────────────────────────────────────────────────
-SYSTEM_PROMPT = """
+SYSTEM_PROMPT = StaticPrompt("""
 You are a medical‑AI assistant helping a physician diagnose and treat
 patients.  **Always follow the exact output formats below.**
 
@@ -80,7 +117,7 @@ Action Input: Serum Lipase, Abdominal Ultrasound
 
 Action: Physical Examination
 Action Input: McBurney's Point Tenderness
-"""
+""")
 
 
 QUERY_PROMPT = """\
@@ -89,6 +126,9 @@ Consider the following case and perform your task by thinking, planning, and usi
 Patient History:
 {patient_history}
 """
+# one slot, so callers just concatenate: QUERY_PREFIX + history + QUERY_SUFFIX
+QUERY_PREFIX, QUERY_SUFFIX = QUERY_PROMPT.split("{patient_history}")
+assert "{" not in QUERY_PREFIX + QUERY_SUFFIX, "QUERY_PROMPT must have exactly one field"
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Matcher prompts
@@ -103,6 +143,7 @@ Return each test name along with its corresponding result.
 If a test is not available, state that.
 Respond in natural language
 """
+LABS_MATCHER_FMT = compile_template(LABS_MATCHER_PROMPT)
 
 IMAGING_MATCHER_PROMPT = """
 Available imaging studies: {available_imaging}.
@@ -114,12 +155,13 @@ Do not propose or mention any additional or alternative tests or imaging.
 Return the study name along with the full report. 
 Respond in natural language.
 """
+IMAGING_MATCHER_FMT = compile_template(IMAGING_MATCHER_PROMPT)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Multi-agent prompts
 # ──────────────────────────────────────────────────────────────────────────────
 
-INFO_GATHERING_PROMPT = """\
+INFO_GATHERING_PROMPT = StaticPrompt("""\
 You are a medical-AI assistant helping a physician COLLECT information 
 that will later be used to diagnose and treat the patient.  
 **Always follow the exact output formats below.**
@@ -155,9 +197,9 @@ HARD RULES  (read carefully)
 4. **STOP AFTER FORMAT 2:** Once you have provided FORMAT 2, you MUST stop. Do NOT ask for any more information or tools after FORMAT 2. Your task is finished after FORMAT 2.
 
 5. Stop asking for additional information when you are confident enough to provide FORMAT 2.
-"""
+""")
 
-INTERPRETATION_PROMPT = """\
+INTERPRETATION_PROMPT = StaticPrompt("""\
 You are a medical-AI assistant helping a physician interpret laboratory
 results that have already been retrieved.   
 **Always follow the exact output formats below.**
@@ -193,10 +235,10 @@ HARD RULES  (read carefully)
      (“high”, “normal”, or “low”) for every test you mention.
 
 3. Do NOT mix elements from different formats.
-"""
+""")
 
 
-DIAGNOSIS_PROMPT = """
+DIAGNOSIS_PROMPT = StaticPrompt("""
 You are a medical‑AI assistant helping a physician diagnose and treat
 patients.  **Always follow the exact output format below.**
 ────────────────────────────────────────────────────────────────────────
@@ -223,4 +265,13 @@ HARD RULES  (read carefully)
 
 2. **STOP AFTER FORMAT:** Once you have provided FORMAT (Final Diagnosis and Treatment), you MUST stop. Do NOT ask for any more information or tools after FORMAT. Your task is finished after FORMAT.
 
-"""
+""")
+
+
+HISTORY_SUMMARY_PROMPT = StaticPrompt("""\
+You are a medical-AI assistant keeping a running case summary for a physician.
+Merge the previous summary (if any) and the conversation excerpt below into one
+terse summary.  Keep every physical-exam finding, laboratory value (with its
+interpretation) and imaging result verbatim; drop reasoning and formatting.
+Respond with the summary only.
+""")
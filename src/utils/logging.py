@@ -48,12 +48,18 @@ def initialize_file_logging(log_filename: str) -> bool:
 def safe_print(text, title=""):
     """
     Prints text with a title, using Rich Panel if DEBUG_FLAG is True, 
-    otherwise uses plain print.
+    otherwise uses plain print. The panel is also written to `file_console`
+    when file logging is initialised (one Panel serves both consoles).
     """
+    text = text if isinstance(text, str) else str(text)     # Ensure text and title are strings
+    title = title if isinstance(title, str) else str(title)
+    panel = Panel(text, title=title) if DEBUG_FLAG or file_console else None
+    if file_console:
+        file_console.print(panel)
     if DEBUG_FLAG:
         # Use the global console for Panel output to terminal, it will be Rich if RICH_DISABLE is not active.
-        console.print(Panel(str(text), title=str(title))) # Ensure text and title are strings
+        console.print(panel)
     else:
         # Use standard print for non-DEBUG to ensure it's truly plain
         # This will not use Rich, especially if RICH_DISABLE is set via os.environ
-        print(f"[{str(title)}] {str(text)[:120]}…") # Ensure text and title are strings
+        print(f"[{title}] {text[:120]}…")
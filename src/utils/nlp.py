@@ -1,39 +1,70 @@
 import spacy
 import string
 from negspacy.negation import Negex
-from typing import List, Union
-from fuzzywuzzy import fuzz
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+from rapidfuzz import fuzz
 
-# Load spaCy model
-nlp = spacy.load("en_core_sci_lg")
+# Load spaCy model; only tok2vec + ner feed doc.ents, which is all Negex and
+# the helpers below read, so the tagging/parsing components are switched off
+nlp = spacy.load(
+    "en_core_sci_lg",
+    disable=["tagger", "parser", "attribute_ruler", "lemmatizer"],
+)
 
 # Register and add the Negex component
 nlp.add_pipe("negex", config={"chunk_prefix": ["no"]}, last=True)
 
-def keyword_positive(sentence: str, keyword: str) -> bool:
-    """Check if a keyword is positively stated in a sentence (not negated)."""
-    doc = nlp(sentence)
-    for e in doc.ents:
-        if keyword.lower() in e.text.lower():
-            return not e._.negex
-    return keyword.lower() in sentence.lower()
+@lru_cache(maxsize=4096)
+def _entities(text: str) -> Tuple[Tuple[str, bool], ...]:
+    """Run the pipeline once per distinct text; (lowercased entity, negated) pairs."""
+    doc = nlp(text)
+    return tuple((e.text.lower(), e._.negex) for e in doc.ents)
+
+def keyword_positive(sentence: str, keyword: str, lowered: Optional[str] = None) -> bool:
+    """Check if a keyword is positively stated in a sentence (not negated).
+
+    `lowered` is `sentence.lower()` when the caller already has it.
+    """
+    keyword = keyword.lower()
+    for ent_text, negated in _entities(sentence):
+        if keyword in ent_text:
+            return not negated
+    return keyword in (sentence.lower() if lowered is None else lowered)
 
 def remove_punctuation(input_string: str) -> str:
     """Remove punctuation from a string."""
     translator = str.maketrans("", "", string.punctuation)
     return input_string.translate(translator)
 
-def contains(keyword: str, strings: List[str]) -> bool:
-    """Check if a keyword is present in any string from a list."""
-    return any(keyword_positive(string, keyword) for string in strings)
+def contains(keyword: str, strings: List[str], batch_size: int = 64) -> bool:
+    """Check if a keyword is present in any string from a list.
+
+    Same result as `any(keyword_positive(s, keyword) for s in strings)`, but
+    the strings that can match are parsed together with `nlp.pipe`.
+    """
+    keyword = keyword.lower()
+    # keyword_positive is only True when the keyword is a substring of the text
+    candidates = [s for s in strings if keyword in s.lower()]
+    for doc in nlp.pipe(candidates, batch_size=batch_size):
+        for e in doc.ents:
+            if keyword in e.text.lower():
+                if not e._.negex:
+                    return True
+                break
+        else:
+            return True   # no matching entity: the substring check decides
+    return False
 
 def is_negated(text: str, keyword: str) -> bool:
     """Check if a keyword appears in the text and is negated."""
-    doc = nlp(text)
+    ents = _entities(text)
+    keyword = keyword.lower()
     try:
-        for ent in doc.ents:
-            if fuzz.partial_ratio(keyword.lower(), ent.text.lower()) > 90:
-                return ent._.negex
+        for ent_text, negated in ents:
+            # score_cutoff lets rapidfuzz drop hopeless entities early (scores < 90 come back as 0)
+            if fuzz.partial_ratio(keyword, ent_text, score_cutoff=90) > 90:
+                return negated
         return False
     except Exception:
         return False
@@ -0,0 +1,23 @@
+# src/utils/paths.py
+
+"""
+Shared, memoized path helpers for the runner and evaluation scripts.
+"""
+
+import os
+from functools import cache
+from pathlib import Path
+
+from ..config import CONFIG
+
+
+@cache
+def dataset_path_for(split: str) -> str:
+    """Path of `master_patient_data_<split>.json` under the configured dataset base path."""
+    return os.path.join(CONFIG.paths.dataset_base_path, f"master_patient_data_{split}.json")
+
+
+@cache
+def log_dir_name(log_dir: str) -> str:
+    """Final path component of a log directory (e.g. `gpt_gpt_val`)."""
+    return Path(log_dir).name
@@ -10,9 +10,12 @@ process_patient(stream)
     Consume the streamed graph output for one patient, record the full
     conversation, and collect tool-usage metrics.
 
-process_all_patients(graph, dataset_path, log_dir, *, max_workers=1, …)
+aprocess_patient(astream)
+    The same for an async stream (`graph.astream`).
+
+process_all_patients(graph, dataset_path, log_dir, *, max_workers=1, gpu_cleanup=False, …)
     Iterate over every patient in the dataset, feed them into the compiled
-    `graph`, and save a per-patient JSON log.  
+    `graph`, and save a per-patient JSON log (or one shared JSONL file).  
     Supports optional thread-pool concurrency for network-bound LLM calls and
     shows periodic progress / GC.
 
@@ -29,138 +32,243 @@ All paths, prompts, and logging settings live elsewhere; this file is purely
 about **executing** a compiled pipeline cleanly and reproducibly.
 """
 
+import asyncio
 import os
 import time
-import json
 import gc
+import itertools
+import queue
 import re
-import torch
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from types import MappingProxyType
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
 import orjson
 
 from langgraph.graph import StateGraph
-from rich.panel import Panel
 
 from .logging import safe_print, file_console, console
-from ..prompts import QUERY_PROMPT
+from ..prompts import QUERY_PREFIX, QUERY_SUFFIX
 
 
 # should I get these from config.py
 PRINT_EVERY = 10
 GC_EVERY = 50 
 
+# read-only stand-in for a missing args / response_dict in a tool call
+_EMPTY = MappingProxyType({})
 
-def process_patient(stream):
+# split on commas that are _not_ followed (before the next ')' ) by a ')'
+_LAB_SPLIT_RE = re.compile(r',\s*(?![^()]*\))')
+
+
+def _imap_unordered(executor, fn, items, window: int):
     """
-    Consume the agent’s stream for one patient, record the full conversation
-    and basic tool-usage metrics.
+    Yield `fn(item)` for every item in completion order, keeping at most
+    `window` submitted to `executor` at a time (refilled as each finishes).
+    """
+    items = iter(items)
+    pending = {executor.submit(fn, item) for item in itertools.islice(items, window)}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            for item in itertools.islice(items, 1):
+                pending.add(executor.submit(fn, item))
+            yield fut.result()
 
-    Args:
-        stream: generator yielding dicts with {"messages": [...]}.
 
-    Returns:
-        final_message (str): last model output
-        metrics (dict): counts & requested‐lists
-        conversation (list of dict): [{"type": ..., "content": ...}, ...]
+@lru_cache(maxsize=None)
+def _type_header(msg_type: str) -> bytes:
+    """Encoded `<type>:\n` transcript header; only a handful of message types exist."""
+    return f"{msg_type}:\n".encode("utf-8")
+
+
+def _log_writer(writer_q: "queue.Queue", jsonl_path: str | None = None) -> None:
     """
-    final_message = None
-    conversation = []
+    Drain (path, bytes) pairs from `writer_q` to disk until a None arrives.
+    With `jsonl_path`, every record goes to that one file (opened once) instead.
+    """
+    if jsonl_path is not None:
+        _jsonl_writer(writer_q, jsonl_path)
+        return
+    while (job := writer_q.get()) is not None:
+        path, data = job
+        try:
+            # BINARY mode, since the buffer holds the raw bytes from orjson.dumps()
+            with open(path, "wb", buffering=1 << 20) as f:
+                f.write(data)
+        except OSError as e:
+            console.log(f"[red]Could not write {path}: {e}")
+
+
+def _jsonl_writer(writer_q: "queue.Queue", jsonl_path: str) -> None:
+    """`_log_writer` into one shared file; failures are logged and the queue keeps draining."""
+    lost = 0
+    try:
+        f = open(jsonl_path, "wb", buffering=1 << 20)
+    except OSError as e:
+        console.log(f"[red]Could not open {jsonl_path}: {e}")
+        f = None
+    while (job := writer_q.get()) is not None:
+        if f is None:
+            lost += 1
+            continue
+        try:
+            f.write(job[1])
+        except OSError as e:
+            lost += 1
+            console.log(f"[red]Could not write a record to {jsonl_path}: {e}")
+    if f is not None:
+        try:
+            f.close()
+        except OSError as e:
+            console.log(f"[red]Could not flush {jsonl_path}: {e}")
+    if lost:
+        console.log(f"[red]{lost} patient record(s) were not written to {jsonl_path}")
 
-    # tool‐usage flags & counters
-    physical_exam_first = False
-    physical_exam_requested = False
-    first_tool_call_processed = False
 
-    lab_tests_requested = []
-    physical_exam_maneuvers_requested = []
-    imaging_requested = []
+class _PatientRecorder:
+    """
+    Per-patient accumulator behind `process_patient` / `aprocess_patient`:
+    `feed` each streamed packet, then `result` for the final triple.
+    """
 
-    lab_count = 0
-    imaging_count = 0
-    tool_call_count = 0
-    physical_exam_count = 0
-    
-    first_printed = False
+    def __init__(self):
+        self.final_message = None
+        self.msg_type = None
+        self.conversation = []
 
-    for packet in stream:
+        # tool‐usage flags & counters
+        self.physical_exam_first = False
+        self.physical_exam_requested = False
+        self.first_tool_call_processed = False
+
+        self.lab_tests_requested = []
+        self.physical_exam_maneuvers_requested = []
+        self.imaging_requested = []
+
+        self.lab_count = 0
+        self.imaging_count = 0
+        self.tool_call_count = 0
+        self.physical_exam_count = 0
+
+    def feed(self, packet) -> None:
         message = packet["messages"][-1]
         msg_type = message.__class__.__name__
         msg_content = message.content
-        
+
         # only print the very first turn
-        if not first_printed:
+        if self.msg_type is None:
             safe_print(msg_content, msg_type)
-            if file_console:
-                file_console.print(Panel(msg_content, title=msg_type))
-            first_printed = True
 
         # record the turn
-        conversation.append({
+        self.conversation.append({
             "type": msg_type,
             "content": msg_content
         })
 
         # inspect any tool calls
-        if hasattr(message, "tool_calls") and message.tool_calls:
-            for call in message.tool_calls:
-                tool_call_count += 1
-                rd = call.get("args", {}).get("response_dict", {})
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            for call in tool_calls:
+                self.tool_call_count += 1
+                rd = (call.get("args") or _EMPTY).get("response_dict") or _EMPTY
                 action = rd.get("action", "").lower()
 
                 # first tool call?
-                if not first_tool_call_processed:
-                    physical_exam_first = (action == "physical examination")
-                    first_tool_call_processed = True
+                if not self.first_tool_call_processed:
+                    self.physical_exam_first = (action == "physical examination")
+                    self.first_tool_call_processed = True
 
                 # per‐action bookkeeping
-                if action == "physical examination":
-                    physical_exam_requested = True
-                    physical_exam_count += 1
-                    maneuvers = [
-                        m.strip().lower()
-                        for m in rd.get("action_input", "").split(",")
-                        if m.strip()
-                    ]
-                    physical_exam_maneuvers_requested.extend(maneuvers)
-
-                elif action == "laboratory tests":
-                    lab_count += 1
-                    raw = rd.get("action_input", "")
-                    # split on commas that are _not_ followed (before the next ')' ) by a ')'
-                    pattern = r',\s*(?![^()]*\))'
-                    tests = [t.strip().lower() for t in re.split(pattern, raw) if t.strip()]
-                    lab_tests_requested.extend(tests)
-
-                elif action == "imaging":
-                    imaging_count += 1
-                    imgs = [
-                        i.strip().lower()
-                        for i in rd.get("action_input", "").split(",")
-                        if i.strip()
-                    ]
-                    imaging_requested.extend(imgs)
-
-
-        final_message = msg_content
-        
-    # after the loop, print the final turn
-    safe_print(final_message, msg_type)
-    if file_console:
-        file_console.print(Panel(final_message, title=msg_type))
+                handler = _ACTION_HANDLERS.get(action)
+                if handler is not None:
+                    handler(rd, self)
+
+        self.msg_type = msg_type
+        self.final_message = msg_content
+
+    def result(self):
+        if self.msg_type is None:
+            raise ValueError("agent stream produced no messages")
+        # after the loop, print the final turn
+        safe_print(self.final_message, self.msg_type)
+
+        metrics = {
+            "physical_exam_first": self.physical_exam_first,
+            "physical_exam_requested": self.physical_exam_requested,
+            "lab_tests_requested": self.lab_tests_requested,
+            "imaging_requested": self.imaging_requested,
+            "physical_exam_maneuvers_requested": self.physical_exam_maneuvers_requested,
+            "lab_count": self.lab_count,
+            "imaging_count": self.imaging_count,
+            "tool_call_count": self.tool_call_count,
+            "physical_exam_count": self.physical_exam_count,
+        }
+
+        return self.final_message, metrics, self.conversation
+
+
+def _handle_exam(rd, rec: _PatientRecorder) -> None:
+    rec.physical_exam_requested = True
+    rec.physical_exam_count += 1
+    rec.physical_exam_maneuvers_requested.extend(
+        m.strip().lower()
+        for m in rd.get("action_input", "").split(",")
+        if m.strip()
+    )
+
+
+def _handle_labs(rd, rec: _PatientRecorder) -> None:
+    rec.lab_count += 1
+    raw = rd.get("action_input", "")
+    rec.lab_tests_requested.extend(
+        t.strip().lower() for t in _LAB_SPLIT_RE.split(raw) if t.strip()
+    )
+
+
+def _handle_imaging(rd, rec: _PatientRecorder) -> None:
+    rec.imaging_count += 1
+    rec.imaging_requested.extend(
+        i.strip().lower()
+        for i in rd.get("action_input", "").split(",")
+        if i.strip()
+    )
+
+
+# lowercased tool action -> bookkeeping for that call
+_ACTION_HANDLERS = {
+    "physical examination": _handle_exam,
+    "laboratory tests":     _handle_labs,
+    "imaging":              _handle_imaging,
+}
+
+
+def process_patient(stream):
+    """
+    Consume the agent’s stream for one patient, record the full conversation
+    and basic tool-usage metrics.
+
+    Args:
+        stream: generator yielding dicts with {"messages": [...]}.
+
+    Returns:
+        final_message (str): last model output
+        metrics (dict): counts & requested‐lists
+        conversation (list of dict): [{"type": ..., "content": ...}, ...]
+    """
+    recorder = _PatientRecorder()
+    for packet in stream:
+        recorder.feed(packet)
+    return recorder.result()
 
-    metrics = {
-        "physical_exam_first": physical_exam_first,
-        "physical_exam_requested": physical_exam_requested,
-        "lab_tests_requested": lab_tests_requested,
-        "imaging_requested": imaging_requested,
-        "physical_exam_maneuvers_requested": physical_exam_maneuvers_requested,
-        "lab_count": lab_count,
-        "imaging_count": imaging_count,
-        "tool_call_count": tool_call_count,
-        "physical_exam_count": physical_exam_count,
-    }
 
-    return final_message, metrics, conversation
+async def aprocess_patient(astream):
+    """`process_patient` for an async stream (e.g. `graph.astream(...)`)."""
+    recorder = _PatientRecorder()
+    async for packet in astream:
+        recorder.feed(packet)
+    return recorder.result()
 
 
 def process_all_patients(
@@ -169,51 +277,104 @@ def process_all_patients(
     log_dir: str,
     *,
     patient_data=None,
-    max_workers: int = 1
+    max_workers: int = 1,
+    gpu_cleanup: bool = False,
+    log_format: str = "txt",
+    use_async: bool = False
 ) -> None:
     """
     Run the agent on every patient, save per-patient JSON logs,
     and track only crash/error flags for quick debugging.
+
+    `gpu_cleanup=True` also empties the CUDA cache at each GC checkpoint;
+    off by default since the agents only call remote LLMs.
+
+    `log_format="jsonl"` writes one {"pid", "meta", "conversation"} record
+    per patient to `log_dir/logs.jsonl` instead of one `<pid>.txt` each. The
+    evaluators (run_evals.py) read the per-patient .txt layout, so "txt"
+    stays the default.
+
+    `use_async=True` drives the patients with `graph.astream` on one event
+    loop instead of a thread pool, with up to `max_workers` in flight.
     """
+    if log_format not in ("txt", "jsonl"):
+        raise ValueError(f"log_format must be txt|jsonl, got {log_format}")
+    jsonl = log_format == "jsonl"
 
     # ------------- I/O & initialisation --------------------------------------
     t0_global = time.time()
-    with open(dataset_path) as f:
-        data_json = json.load(f) if patient_data is None else patient_data
-
-    patients       = list(data_json.items())
-    total_patients = len(patients)
+    if patient_data is None:
+        with open(dataset_path, "rb") as f:
+            data_json = orjson.loads(f.read())
+    else:
+        data_json = patient_data
+
+    # a lazy items view: the dict is already in memory, no need for a list copy
+    patients       = data_json.items()
+    total_patients = len(data_json)
     console.log(f"[green]▶ Starting evaluation on {total_patients} patients")
     if file_console:
         file_console.print(f"▶ Starting evaluation on {total_patients} patients")
 
     os.makedirs(log_dir, exist_ok=True)
 
-    # ------------- helper ----------------------------------------------------
-    def _run_single(item):
-        pid, pdata = item
+    # per-patient logs are written by one background thread, so workers go
+    # straight back to the next LLM-bound patient; the bounded queue makes
+    # workers wait rather than pile up unwritten logs if the disk falls behind.
+    # Not a daemon: it is always drained and joined below, even on errors.
+    writer_q = queue.Queue(maxsize=4 * max(1, max_workers))
+    writer = threading.Thread(
+        target=_log_writer,
+        args=(writer_q, os.path.join(log_dir, "logs.jsonl") if jsonl else None),
+        name="log-writer",
+    )
+
+    # ------------- helpers ---------------------------------------------------
+    def _inputs(pid, pdata):
         # build the initial user query
-        query = QUERY_PROMPT.format(patient_history=pdata["Patient History"])
-        inputs = {
+        query = QUERY_PREFIX + pdata["Patient History"] + QUERY_SUFFIX
+        return {
             "messages": [("user", query)],
             "patient_id": pid,
             "iteration": 0
         }
 
+    def _run_single(item):
+        pid, pdata = item
         t0 = time.time()
         try:
-            final_txt, metrics, conversation = process_patient(
-                graph.stream(inputs, stream_mode="values")
-            )
-            error_flag = "[ERROR] exceeded retries" in final_txt
+            outcome = process_patient(graph.stream(_inputs(pid, pdata), stream_mode="values"))
         except Exception as e:
-            console.log(f"[red]Patient {pid} crashed in stream: {e}")
-            final_txt    = f"[ERROR] stream failure: {e}"
+            outcome = e
+        dur = time.time() - t0
+        writer_q.put(_log_entry(pid, pdata, outcome, dur))
+        return dur
+
+    async def _arun_single(item):
+        pid, pdata = item
+        t0 = time.time()
+        try:
+            outcome = await aprocess_patient(graph.astream(_inputs(pid, pdata), stream_mode="values"))
+        except Exception as e:
+            outcome = e
+        dur = time.time() - t0
+        # a full writer queue must not block the event loop, so the put
+        # waits in the default executor instead
+        entry = _log_entry(pid, pdata, outcome, dur)
+        await asyncio.get_running_loop().run_in_executor(None, writer_q.put, entry)
+        return dur
+
+    def _log_entry(pid, pdata, outcome, dur):
+        # the (path, bytes) item for the writer thread; path None means logs.jsonl
+        if isinstance(outcome, Exception):
+            console.log(f"[red]Patient {pid} crashed in stream: {outcome}")
+            final_txt    = f"[ERROR] stream failure: {outcome}"
             metrics      = {}
             conversation = []
             error_flag   = True
-
-        dur = time.time() - t0
+        else:
+            final_txt, metrics, conversation = outcome
+            error_flag = "[ERROR] exceeded retries" in final_txt
 
         # ───── save per-patient log ─────────────────────────────────────────
         meta = {
@@ -223,53 +384,86 @@ def process_all_patients(
             "duration_sec":    dur,
             "gold_diagnosis":  pdata["Discharge Diagnosis"].lower()
         }
-        
-        output_path = os.path.join(log_dir, f"{pid}.txt")
-        # open in BINARY mode so we can write the raw bytes from orjson.dumps()
-        with open(output_path, "wb") as f:
-            # 1) write a JSON front-matter
-            f.write(orjson.dumps(meta) + b"\n\n")
-
-            # 2) then the human-readable transcript
-            if conversation:
-                for turn in conversation:
-                    f.write(f"{turn['type']}:\n".encode("utf-8"))
-                    f.write(turn['content'].encode("utf-8") + b"\n\n")
-            else: # log the error at least
-                f.write(final_txt.encode("utf-8") + b"\n")
-
-
-        return dur
+        if jsonl:
+            record = {"pid": pid, "meta": meta, "conversation": conversation}
+            return None, orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
 
-    # ------------- optional thread pool --------------------------------------
-    executor = (
-        ThreadPoolExecutor(max_workers=max_workers)
-        if max_workers > 1
-        else None
-    )
-    iterator = (
-        executor.map(_run_single, patients)
-        if executor
-        else map(_run_single, patients)
-    )
+        output_path = os.path.join(log_dir, f"{pid}.txt")
+        # assemble the whole log in memory; the writer thread saves it in one write
+        # 1) a JSON front-matter
+        buf = bytearray(orjson.dumps(meta, option=orjson.OPT_APPEND_NEWLINE))
+        buf += b"\n"
+
+        # 2) then the human-readable transcript
+        if conversation:
+            for turn in conversation:
+                buf += _type_header(turn['type'])
+                buf += turn['content'].encode("utf-8")
+                buf += b"\n\n"
+        else: # log the error at least
+            buf += final_txt.encode("utf-8")
+            buf += b"\n"
+
+        return output_path, buf
 
-    # ------------- main loop --------------------------------------------------
     total_time = 0.0
-    for idx, dur in enumerate(iterator, start=1):
+
+    def _progress(idx, dur):
+        nonlocal total_time
         total_time += dur
         if idx % PRINT_EVERY == 0:
             avg = total_time / idx
-            console.log(f"processed {idx}/{total_patients} "
-                        f"(last {dur:.1f}s, avg {avg:.1f}s)")
+            # format once; console.print skips console.log's caller-frame capture
+            msg = f"processed {idx}/{total_patients} (last {dur:.1f}s, avg {avg:.1f}s)"
+            console.print(msg)
             if file_console:
-                file_console.print(f"processed {idx}/{total_patients} "
-                                   f"(last {dur:.1f}s, avg {avg:.1f}s)")
+                file_console.print(msg)
         if idx % GC_EVERY == 0:
             gc.collect()
-            torch.cuda.empty_cache()
+            if gpu_cleanup:
+                import torch   # only needed for local GPU work; keeps this module light
+                if torch.cuda.is_available() and torch.cuda.memory_allocated() > 0:
+                    torch.cuda.empty_cache()
+
+    executor = None
+    writer.start()
+    try:
+        if use_async:
+            # ------------- event loop ----------------------------------------
+            async def _run_all():
+                limit = asyncio.Semaphore(max(1, max_workers))
+
+                async def bounded(item):
+                    async with limit:
+                        return await _arun_single(item)
+
+                tasks = [asyncio.ensure_future(bounded(item)) for item in patients]
+                for idx, fut in enumerate(asyncio.as_completed(tasks), start=1):
+                    _progress(idx, await fut)
+
+            asyncio.run(_run_all())
+        else:
+            # ------------- optional thread pool ------------------------------
+            if max_workers > 1:
+                executor = ThreadPoolExecutor(max_workers=max_workers)
+            # completion order, so a slow patient does not hold back the progress log;
+            # a bounded submission window keeps every worker busy without queueing all
+            iterator = (
+                _imap_unordered(executor, _run_single, patients, window=2 * max_workers)
+                if executor
+                else map(_run_single, patients)
+            )
 
-    if executor:
-        executor.shutdown(wait=True)
+            # ------------- main loop -----------------------------------------
+            for idx, dur in enumerate(iterator, start=1):
+                _progress(idx, dur)
+    finally:
+        # workers still running (after an error or Ctrl-C) get to queue their
+        # logs before the writer is told to stop; finished patients stay on disk
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+        writer_q.put(None)
+        writer.join()
 
     # ------------- summary ---------------------------------------------------
     elapsed = time.time() - t0_global
@@ -0,0 +1,34 @@
+import pytest
+
+from src.prompts import (
+    IMAGING_MATCHER_PROMPT,
+    LABS_MATCHER_PROMPT,
+    QUERY_PREFIX,
+    QUERY_PROMPT,
+    QUERY_SUFFIX,
+    compile_template,
+)
+
+
+@pytest.mark.parametrize(
+    "template, values",
+    [
+        ("{a}{b}", {"a": "1", "b": "2"}),
+        ("a{x}{y}", {"x": "1", "y": "2"}),
+        ("x{a}y", {"a": "1"}),
+        ("{a}", {"a": "1"}),
+        ("{a}", {"a": 7}),
+        ("x{a}y{b}z", {"a": 1.5, "b": None}),
+        ("no fields", {}),
+        (LABS_MATCHER_PROMPT, {"available_tests": "CBC", "requested_tests": "BMP"}),
+        (IMAGING_MATCHER_PROMPT, {"available_imaging": "CT", "requested_imaging": "US"}),
+        (QUERY_PROMPT, {"patient_history": "45M, RLQ pain"}),
+    ],
+)
+def test_compile_template_matches_format(template, values):
+    assert compile_template(template)(**values) == template.format(**values)
+
+
+def test_query_halves_match_format():
+    history = "45M, RLQ pain"
+    assert QUERY_PREFIX + history + QUERY_SUFFIX == QUERY_PROMPT.format(patient_history=history)